@@ -0,0 +1,121 @@
+import random
+from datetime import date, timedelta
+
+TEAMS = 24
+SQUAD = 18
+STARTERS = 11
+BASE_GAME_ID = 100000
+GAMES_PER_SEASON = TEAMS * (TEAMS - 1)
+
+STAT_CELLS = ['foulsCommitted', 'yellowCards', 'redCards', 'offsides', 'wonCorners', 'saves']
+PLAYER_STATS = ['totalGoals', 'goalAssists', 'shotsOnTarget', 'totalShots', 'foulsCommitted', 'foulsSuffered', 'yellowCards', 'redCards']
+COMMENT_TYPES = ['goal', 'yellow-card', 'red-card', 'substitution', 'attempt-saved', 'attempt-missed', 'foul', 'corner', 'offside', '']
+
+
+def _filler(rnd, kb):
+    """Navigation and script boilerplate, the bulk of a real ESPN page that the parsers have to skip."""
+    block = ('<div class="nav-item"><a class="AnchorLink" href="/football/team/_/id/{0}">Link {0}</a>'
+             '<script>window.__espn = {{"id": {0}, "uid": "s:600~t:{0}"}};</script></div>')
+    blocks = []
+    size = 0
+    while size < kb * 1024:
+        blocks.append(block.format(rnd.randint(1, 10 ** 6)))
+        size += len(blocks[-1])
+    return ''.join(blocks)
+
+
+def season_games(season, start=date(2022, 7, 29)):
+    """
+    Fixtures for one synthetic season of the league: every team plays every other home and away.
+
+    Returns:
+        dict: Lists of (game_id, home_team, away_team) keyed by match date, games mostly on Saturdays with some midweek rounds.
+    """
+    rnd = random.Random(season)
+    season_start = start.replace(year=start.year + season)
+    pairs = [(home, away) for home in range(TEAMS) for away in range(TEAMS) if home != away]
+    rnd.shuffle(pairs)
+
+    matchdays = []
+    day = season_start + timedelta(days=(5 - season_start.weekday()) % 7)
+    while len(matchdays) * (TEAMS // 2) < len(pairs):
+        matchdays.append(day)
+        if len(matchdays) % 4 == 0:
+            matchdays.append(day + timedelta(days=3))
+        day += timedelta(days=7)
+
+    games = {}
+    for i, (home, away) in enumerate(pairs):
+        game_id = BASE_GAME_ID + season * 1000 + i
+        games.setdefault(matchdays[i // (TEAMS // 2)], []).append((game_id, season * 100 + home, season * 100 + away))
+    return games
+
+
+def fixture_page(games, kb=20, seed=0):
+    """A fixture date page, one AnchorLink per game, as read by get_match_links."""
+    rnd = random.Random(seed)
+    rows = ''.join(f'<tr><td><a class="AnchorLink at" href="/football/match/_/gameId/{game_id}">{home} v {away}</a></td></tr>'
+                   for game_id, home, away in games)
+    return f'<html><head><title>Fixtures</title></head><body>{_filler(rnd, kb)}<table>{rows}</table></body></html>'
+
+
+def match_page(game_id, home, away, finished=True, kb=60):
+    """
+    A match page with the DOM structure get_match_data relies on: competitors (with home and away swapped, as on ESPN),
+    game status, game information, data-stat cells for both sides and accordion-item lineups in two content tabs.
+    """
+    rnd = random.Random(game_id)
+
+    def team(side, team_id):
+        return (f'<div class="team {side}"><a class="team-name" data-clubhouse-uid="s:600~t:{team_id}" href="/football/club/_/id/{team_id}">'
+                f'<span class="long-name">Team {team_id} FC</span><span class="short-name">Team {team_id}</span>'
+                f'<span class="abbrev">T{team_id}</span></a></div>')
+
+    def stats(side):
+        on_target = rnd.randint(0, 9)
+        cells = ''.join(f'<tr><td data-home-away="{side}" data-stat="{stat}">{rnd.randint(0, 15)}</td></tr>' for stat in STAT_CELLS)
+        return (cells + f'<span data-home-away="{side}" data-stat="possessionPct">{rnd.randint(30, 70)}%</span>'
+                f'<span data-home-away="{side}" data-stat="shotsSummary">{on_target + rnd.randint(0, 10)} ({on_target})</span>')
+
+    def lineup(team_id, style):
+        items = []
+        for n in range(SQUAD):
+            player_id = team_id * 100 + n
+            player_stats = ''.join(f'<span data-stat="{stat}">{rnd.choice([0, 0, 0, 1, 2])}</span>' for stat in PLAYER_STATS)
+            if n < STARTERS:
+                number = f'<span style="width:20px;display:inline-block">{n + 1}</span>'
+                sub = ''
+            else:
+                # Substitutes' numbers are padded with em spaces on ESPN
+                number = f'<span>\u2003{n + 1}\u2003</span>'
+                sub = f'<span class="icon-soccer-substitution-before">{rnd.randint(46, 90)}\'</span>'
+            items.append(f'<div class="accordion-item" data-id="{player_id}">{number}'
+                         f'<a data-player-uid="s:600~a:{player_id}" href="/football/player/_/id/{player_id}"> Player {player_id} </a>'
+                         f'{sub}{player_stats}</div>')
+        return f'<div class="content-tab" style="{style}">{"".join(items)}</div>'
+
+    kickoff = date(2022, 8, 1) + timedelta(days=game_id % 280)
+    status = 'FT' if finished else '19:45'
+    return f'''<html><head><title>Match {game_id}</title></head><body>{_filler(rnd, kb // 2)}
+<div class="game-status"><span class="game-time">{status}</span></div>
+<div class="competitors">{team('away', home)}{team('home', away)}</div>
+<span data-home-away="home" data-stat="score">\n\t{rnd.randint(0, 4)}\n</span><span data-home-away="away" data-stat="score">{rnd.randint(0, 4)}</span>
+<table>{stats('home')}{stats('away')}</table>
+<article class="game-information"><ul><li class="venue"><div>VENUE: Stadium {home}</div></li>
+<li class="subdued"><div><span data-date="{kickoff.isoformat()}T14:00Z">3:00 PM</span></div></li></ul>
+<div class="address"><span>Town {home}, England</span></div>
+<div class="game-info-note capacity">ATTENDANCE: {rnd.randint(5000, 32000):,}</div>
+<ul><li class="referee"><span>REFEREE: Referee {rnd.randint(1, 30)}</span></li></ul></article>
+{lineup(home, 'display: block;')}{lineup(away, 'display: none;')}{_filler(rnd, kb // 2)}</body></html>'''
+
+
+def commentary_page(game_id, comments=90, kb=40):
+    """A commentary page with one tr[data-id=comment-*] row per event, as read by get_commentary_data."""
+    rnd = random.Random(-game_id)
+    rows = []
+    for order in range(comments):
+        minute = order * 90 // comments
+        timestamp = rnd.choice([f"{minute}'", f"{minute}'", f"90'+{rnd.randint(1, 6)}" if minute > 85 else '-'])
+        rows.append(f'<tr data-id="comment-{order}" data-type="{rnd.choice(COMMENT_TYPES)}"><td class="time-stamp">{timestamp}</td>'
+                    f'<td class="game-details">\n  Commentary line {order} for game {game_id}.\n</td></tr>')
+    return f'<html><body>{_filler(rnd, kb)}<table class="commentary">{"".join(rows)}</table></body></html>'
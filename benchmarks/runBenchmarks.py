@@ -0,0 +1,221 @@
+"""
+Offline benchmarks for the scraper: link discovery, page download and parsing against a local stand-in for espn.co.uk.
+
+Run from the repository root, e.g.
+
+    python -m benchmarks.runBenchmarks --seasons 1 10 50 --workers 4
+
+Each number of seasons runs in its own process so peak RSS is measured per run.
+"""
+import argparse, json, os, re, resource, shutil, statistics, subprocess, sys, tempfile, threading, time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from code.FootballScraper import FootballDataScraper, PageStore, config, parse_match_file, parse_commentary_file
+from benchmarks.pageGenerator import season_games, fixture_page, match_page, commentary_page
+
+FIXTURE_PATH = re.compile(r'/football/fixtures/_/date/(\d{8})/')
+GAME_PATH = re.compile(r'/football/(match|commentary)/_/gameId/(\d+)')
+SCOREBOARD_PATH = re.compile(r'/scoreboard\?dates=(\d{8})-(\d{8})')
+
+
+class StandInSite():
+    """
+    Serves generated fixture, match and commentary pages, and the schedule, for a number of seasons on localhost.
+    Pages are generated on request from the game id, so nothing is held in memory but the fixture list.
+    """
+    def __init__(self, seasons, page_kb):
+        self.fixtures = {}
+        self.games = {}
+        for season in range(seasons):
+            for day, games in season_games(season).items():
+                self.fixtures[day.strftime('%Y%m%d')] = games
+                for game_id, home, away in games:
+                    self.games[game_id] = (home, away)
+        self.page_kb = page_kb
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = site.page(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def page(self, path):
+        fixture = FIXTURE_PATH.search(path)
+        if fixture:
+            return fixture_page(self.fixtures.get(fixture.group(1), []), kb=self.page_kb // 3, seed=int(fixture.group(1)))
+        scoreboard = SCOREBOARD_PATH.search(path)
+        if scoreboard:
+            days = [day for day in self.fixtures if scoreboard.group(1) <= day <= scoreboard.group(2)]
+            return json.dumps({'events': [{'date': f'{day[:4]}-{day[4:6]}-{day[6:]}T14:00Z'} for day in days]})
+        game = GAME_PATH.search(path)
+        if game and int(game.group(2)) in self.games:
+            game_id = int(game.group(2))
+            if game.group(1) == 'match':
+                return match_page(game_id, *self.games[game_id], kb=self.page_kb)
+            return commentary_page(game_id, kb=self.page_kb * 2 // 3)
+        return None
+
+    def dates(self, seasons):
+        """The fixture dates get_match_links would walk for the seasons, season start to season end as in footballscraper.config."""
+        start = datetime.strptime(config.season_start_dt, '%Y-%m-%d')
+        end = datetime.strptime(config.season_end_dt, '%Y-%m-%d')
+        dates = []
+        for season in range(seasons):
+            season_start = start.replace(year=start.year + season)
+            season_end = end.replace(year=end.year + season)
+            day = season_start
+            while day <= season_end:
+                dates.append({'strdate': day.strftime('%Y%m%d'), 'date': day.strftime('%Y-%m-%d'), 'game_week': 0})
+                day += timedelta(days=1)
+        return dates
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process and its finished children (parse workers), in MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return max(own, children) / scale
+
+
+def _result(stage, seasons, pages, seconds, latencies=None):
+    result = {'stage': stage, 'seasons': seasons, 'pages': pages, 'seconds': round(seconds, 3),
+              'pages_per_sec': round(pages / seconds, 1) if seconds else None,
+              'ms_per_page': round(1000 * seconds / pages, 2) if pages else None,
+              'peak_rss_mb': round(_peak_rss_mb(), 1)}
+    if latencies:
+        quantiles = statistics.quantiles(latencies, n=20)
+        result['p50_ms'] = round(1000 * statistics.median(latencies), 2)
+        result['p95_ms'] = round(1000 * quantiles[-1], 2)
+    return result
+
+
+def run_seasons(seasons, workers, page_kb, requests_per_second, stages, sample):
+    """Runs the stages for one number of seasons in a scratch folder and returns a result per stage."""
+    scratch = tempfile.mkdtemp(prefix='fbs_bench_')
+    config.data_fld = f'{scratch}/data/'
+    config.games_fld = f'{scratch}/data/games/'
+    config.output_fld = f'{scratch}/data/output/'
+    config.log_fld = f'{scratch}/log/'
+    config.requests_per_second = str(requests_per_second)
+    for folder in (config.games_fld, config.output_fld):
+        os.makedirs(folder, exist_ok=True)
+
+    results = []
+    try:
+        with StandInSite(seasons, page_kb) as site:
+            config.base_url = site.base_url
+            config.schedule_url = f'{site.base_url}/apis/site/v2/sports/soccer/**LEAGUE_VAR**/scoreboard?dates=**DATE_VAR**'
+            fds = FootballDataScraper()
+            fds.dates = site.dates(seasons)
+
+            if 'links' in stages:
+                start = time.perf_counter()
+                fds.get_match_links(from_file=False)
+                requested = sum(fds.metrics.counters.get(f'pages_{outcome}', 0) for outcome in ('downloaded', 'not_modified', 'failed'))
+                results.append(_result('links', seasons, requested, time.perf_counter() - start))
+
+            if 'download' in stages:
+                if fds.match_links is None:
+                    fds.match_links = [f'{site.base_url}/football/{kind}/_/gameId/{game_id}' for game_id in site.games for kind in ('match', 'commentary')]
+                start = time.perf_counter()
+                fds.extract_game_pages()
+                results.append(_result('download', seasons, len(fds.match_links), time.perf_counter() - start))
+
+            if 'parse' in stages:
+                store = PageStore.from_config(config, config.games_fld)
+                if not store.list('match_'):
+                    for game_id, (home, away) in site.games.items():
+                        store.write(f'match_{game_id}', match_page(game_id, home, away, kb=page_kb))
+                        store.write(f'commentary_{game_id}', commentary_page(game_id, kb=page_kb * 2 // 3))
+                match_files = store.list('match_')
+                commentary_files = store.list('commentary_')
+
+                start = time.perf_counter()
+                fds.get_match_data(from_file=False, workers=workers, incremental=False)
+                fds.get_commentary_data(from_file=False, workers=workers, incremental=False)
+                seconds = time.perf_counter() - start
+
+                latencies = []
+                for match_file, commentary_file in zip(match_files[:sample], commentary_files[:sample]):
+                    for parse_func, file in ((parse_match_file, match_file), (parse_commentary_file, commentary_file)):
+                        page_start = time.perf_counter()
+                        parse_func(file)
+                        latencies.append(time.perf_counter() - page_start)
+                results.append(_result('parse', seasons, len(match_files) + len(commentary_files), seconds, latencies))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def print_report(results):
+    columns = ['stage', 'seasons', 'pages', 'seconds', 'pages_per_sec', 'ms_per_page', 'p50_ms', 'p95_ms', 'peak_rss_mb']
+    print('\n' + ' '.join(f'{column:>13}' for column in columns))
+    for result in results:
+        print(' '.join(f'{str(result.get(column, "")):>13}' for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline scraper benchmarks against generated ESPN pages.')
+    parser.add_argument('--seasons', type=int, nargs='+', default=[1, 10, 50], help='Numbers of seasons to benchmark.')
+    parser.add_argument('--stages', nargs='+', default=['links', 'download', 'parse'], choices=['links', 'download', 'parse'])
+    parser.add_argument('--workers', type=int, default=1, help='Parse worker processes.')
+    parser.add_argument('--page-kb', type=int, default=60, help='Approximate size of a generated match page.')
+    parser.add_argument('--requests-per-second', type=float, default=0, help='Per host rate limit, 0 for none.')
+    parser.add_argument('--sample', type=int, default=100, help='Pages timed one by one for the latency percentiles.')
+    parser.add_argument('--json', help='Also write the results to this file.')
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        results = run_seasons(args.seasons[0], args.workers, args.page_kb, args.requests_per_second, args.stages, args.sample)
+        with open(args.json, 'w') as f:
+            json.dump(results, f)
+        return
+
+    results = []
+    for seasons in args.seasons:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            result_file = f.name
+        subprocess.run([sys.executable, '-m', 'benchmarks.runBenchmarks', '--single', '--seasons', str(seasons),
+                        '--stages', *args.stages, '--workers', str(args.workers), '--page-kb', str(args.page_kb),
+                        '--requests-per-second', str(args.requests_per_second), '--sample', str(args.sample),
+                        '--json', result_file], check=True, stdout=subprocess.DEVNULL)
+        with open(result_file) as f:
+            results.extend(json.load(f))
+        os.remove(result_file)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,51 +1,143 @@
 # Import required libraries
-import requests, os, configparser, json, logging, pytz, glob, re
-from bs4 import BeautifulSoup
+import os, sys, configparser, json, logging, pytz, re, importlib.util, hashlib, time
+from bs4 import BeautifulSoup, SoupStrainer
 from datetime import date, timedelta, datetime
 from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 # Import local libraries
-from code. progressBar import progress_bar
+from code.progressBar import Progress
+from code.pageFetcher import PageFetcher, ResponseCache, atomic_write
+from code.pageStore import PageStore, read_page
+from code.datasets import DATASETS, DETAIL_DATASETS, NdjsonWriter, iter_dataset, dataset_exists
+from code.tableExport import FORMATS as TABLE_FORMATS, build_table, write_table, read_table, flatten_commentary
+from code.warehouse import Warehouse
+from code.metrics import RunMetrics, setup_logging, timed_stage
+from code.commentary import EventType, parse_commentary, parse_timestamp
+from code.aggregates import SeasonAggregates
+from code.fixtureCalendar import FixtureCalendar
+from code.statTable import StatTable
 
 # Setup and ingest config file and apply to namespace
 config = configparser.ConfigParser()
 config.read(f'code/footballscraper.config')
 config = Namespace(**config['config'])
 
-# Setup Logger for debugging
-logging.basicConfig(filename=f'{config.log_fld}fbs.log', filemode='w', format='%(name)s - %(levelname)s - %(asctime)s - %(message)s', level=logging.DEBUG)
+# lxml is optional, fall back to the pure python parser when it is not installed
+if config.html_parser == 'lxml' and importlib.util.find_spec('lxml') is None:
+    HTML_PARSER = 'html.parser'
+else:
+    HTML_PARSER = config.html_parser
+if HTML_PARSER == 'lxml':
+    import lxml.html
 
+# Parse only the regions of each page that are read, rather than the whole document
+MATCH_PAGE_CLASSES = {'competitors', 'game-status', 'game-information', 'game-info-note', 'venue', 'subdued',
+                      'address', 'attendance', 'capacity', 'referee', 'content-tab'}
 
-def logtofile(func):
-    """
-    A decorator function that logs the start and end of the execution of the decorated function.
-        Args:       func (function): The function to be decorated.
-        Returns:    function: The decorated function that logs its execution.
-    """
-    def log(*args,**kwargs):
-        """
-        The inner function that adds logging functionality to the decorated function.
-        Args:       *args: The positional arguments passed to the decorated function.
-                    **kwargs: The keyword arguments passed to the decorated function.
-        Returns:    The result of the decorated function.
-        """
-        logging.info(f'START: {func.__name__}')
-        result = func(*args, **kwargs)
-        logging.info(f'END: {func.__name__}')
-        return result
-    return log
+def _is_match_page_region(name, attrs):
+    """SoupStrainer filter keeping the match page tags read by parse_match_file, along with their children."""
+    if 'data-stat' in attrs:
+        return True
+    classes = attrs.get('class') or ''
+    classes = classes.split() if isinstance(classes, str) else classes
+    return not MATCH_PAGE_CLASSES.isdisjoint(classes)
+
+MATCH_PAGE_REGIONS = SoupStrainer(_is_match_page_region)
+COMMENTARY_ROWS = SoupStrainer('tr', {'data-id': re.compile('comment-*')})
+
+# Patterns used for every match page
+GAME_FINISHED = re.compile(r'class="game-time[^"]*"[^>]*>\s*FT\s*<')
+SHOTS_ON_TARGET = re.compile(r'\((\d+)\)')
+SHOTS_TOTAL = re.compile(r'^\d+')
+INLINE_BLOCK_STYLE = re.compile('.*display:inline-block.*')
+
+# Match pages are read from an lxml tree with these XPaths when the parser is lxml, see _parse_match_tree
+def _has_class(name):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+if HTML_PARSER == 'lxml':
+    MATCH_XPATHS = {name: lxml.etree.XPath(path) for name, path in {
+        'venue': f'//li[{_has_class("venue")}]', 'subdued': f'//li[{_has_class("subdued")}]',
+        'address': f'//div[{_has_class("address")}]', 'game_status': f'//div[{_has_class("game-status")}]',
+        'game_time': f'.//span[{_has_class("game-time")}]', 'competitors': f'//div[{_has_class("competitors")}]',
+        'team': './/div[contains(normalize-space(@class), $name)]', 'team_name': './/a[contains(@class, "team-name")]',
+        'team_link': f'.//a[{_has_class("team-name")}]', 'long_name': f'.//span[{_has_class("long-name")}]',
+        'short_name': f'.//span[{_has_class("short-name")}]', 'abbrev': f'.//span[{_has_class("abbrev")}]',
+        'div': './/div', 'span': './/span', 'marker': '//text()[contains(., $marker)]',
+        'side_stats': '//*[@data-home-away and @data-stat]',
+        'lineup': f'//div[{_has_class("content-tab")}][@style=$style]', 'athletes': f'.//div[{_has_class("accordion-item")}]',
+        'player_no': './/span[contains(@style, "display:inline-block")]', 'player_link': './/a[contains(@data-player-uid, $id)]',
+        'subbed_time': f'.//span[{_has_class("icon-soccer-substitution-before")}]',
+        # Substitutes' shirt numbers are padded with em spaces
+        'sub_no': './/text()[contains(., "\u2003")]', 'data_stats': './/span[@data-stat]'}.items()}
+
+MATCH_FILE_ID = re.compile(r'.match_(\d+)\.html')
+
+# Patterns used for every commentary page
+COMMENTARY_FILE_ID = re.compile(r'commentary_(\d+)\.html')
+COMMENT_ORDER_DIGITS = re.compile(r'(\d+)$')
+
+# Bump when the records produced by parse_match_file or parse_commentary_file change, so manifests are re-parsed
+PARSER_VERSION = 5
+
+# Datasets written by get_match_data
+MATCH_DATASETS = ['matches', 'player_details', 'player_stats', 'team_details', 'team_stats']
+# Datasets held in memory as StatTables rather than lists of records
+STAT_DATASETS = ['team_stats', 'player_stats']
+
+# Game id in match and commentary links, pages are saved as match_<id> and commentary_<id>
+GAME_ID = re.compile(r'gameId/(\d+)')
+
+# Pages fetched between saves of the response cache
+CACHE_SAVE_EVERY = 100
+
+# Warehouse table each dataset is loaded into
+WAREHOUSE_TABLES = {'matches':'matches', 'team_details':'teams', 'player_details':'players', 'team_stats':'team_stats',
+                    'player_stats':'player_stats', 'commentary':'commentary'}
 
 class FootballDataScraper():
     """
     A class to scrape football match data from the web and save locally in JSON format. 
     """
-    def __init__(self):
+    def __init__(self, league=None, season=None, profiler=None, profile_stages=None):
         """
-        Initializes the FootballScraper class with the given configuration.    
+        Initializes the FootballScraper class with the given configuration.
+
+        Without a league and season the scraper works on league, season_start_dt and season_end_dt in footballscraper.config,
+        in data_fld, games_fld and output_fld. Given both it works on that shard alone, in <data_fld><league>/<season>/
+        and <output_fld><league>/<season>/, so shards can be scraped side by side (see code/shards.py).
+
+        Args:
+            league (str, optional): ESPN league code, e.g. 'eng.1'.
+            season (int, optional): Year the season starts in. Its dates are season_start_dt and season_end_dt moved to that year.
+            profiler (str, optional): 'cprofile' or 'pyinstrument' to profile stages, writing the profiles to the log folder.
+                Default is profiler in footballscraper.config, blank for none.
+            profile_stages (list, optional): Names of the stages to profile, e.g. ['get_match_data']. Default is profile_stages
+                in footballscraper.config, blank for every stage.
         """
+        setup_logging(config.log_fld, config.log_level)
         logging.info('FootballDataScraper initiated')
-        self.season_str_dt = datetime.strptime(config.season_start_dt,'%Y-%m-%d')
-        self.season_end_dt = datetime.strptime(config.season_end_dt,'%Y-%m-%d')
+        self.log_fld = config.log_fld
+        self.league = league or config.league
+        if season is None:
+            self.season = datetime.strptime(config.season_start_dt,'%Y-%m-%d').year
+            self.data_fld = config.data_fld
+            self.games_fld = config.games_fld
+            self.output_fld = config.output_fld
+        else:
+            self.season = int(season)
+            self.data_fld = f'{config.data_fld}{self.league}/{self.season}/'
+            self.games_fld = f'{self.data_fld}games/'
+            self.output_fld = f'{config.output_fld}{self.league}/{self.season}/'
+        for folder in (self.data_fld, self.games_fld, self.output_fld):
+            os.makedirs(folder, exist_ok=True)
+        self.shard = f'{self.league}/{self.season}'
+        self.metrics = RunMetrics(self.shard.replace('/', '_') if season is not None else None)
+        self.profiler = profiler if profiler is not None else config.profiler
+        self.profile_stages = profile_stages if profile_stages is not None else [stage.strip() for stage in config.profile_stages.split(',') if stage.strip()]
+        self.season_str_dt, self.season_end_dt = season_bounds(self.season)
         self.dates = self._build_season_date_list(self.season_str_dt, self.season_end_dt)
         self.match_links = None
         self.matches = None
@@ -54,8 +146,9 @@ class FootballDataScraper():
         self.player_details = None
         self.player_stats = None
         self.commentary = None
+        self._aggregates = None
 
-    @logtofile
+    @timed_stage
     def _build_season_date_list(self, start, end):
         """
         Generates a list of dates for the football season.
@@ -81,8 +174,8 @@ class FootballDataScraper():
             start += timedelta(days=1)
         return dates
     
-    @logtofile
-    def get_match_links(self, from_file=True):
+    @timed_stage
+    def get_match_links(self, from_file=True, refresh=False, completed=(), on_page=None, all_dates=False):
         """
         Retrieves match links either from a file or by scraping the website.
         
@@ -91,6 +184,17 @@ class FootballDataScraper():
         from_file : bool, optional
             If True, reads match links from a file (default is True).
             If False, scrapes match links from the website.
+        refresh : bool, optional
+            If True, revalidates every fixture page with the website, even those cached
+            within fixture_ttl (default is False).
+        completed : set, optional
+            Dates (YYYYMMDD) whose fixture page was already fetched earlier in this run and is not requested again.
+        on_page : function, optional
+            Called with the url, date and outcome of each fixture page, see _fetch_pages.
+        all_dates : bool, optional
+            If True, requests the fixture page of every date of the season. By default only the dates the fixture
+            calendar (fixture_calendar.json in the data folder) knows or expects to have games are requested,
+            see code/fixtureCalendar.py.
             
         Returns
         -------
@@ -100,78 +204,310 @@ class FootballDataScraper():
         if from_file:
             try:
                 logging.info(f'Getting match links from file')
-                starttime = datetime.now()
-                progress = progress_bar(0, 1, starttime)
-                with open(f'{config.data_fld}' + 'match_links.csv', 'r') as f:
-                    match_links = f.read().split('\n')
-                progress = progress_bar(1, 1, starttime)
-                logging.info(f'{progress}')
+                with self._progress(1, 'get_match_links') as progress:
+                    with open(f'{self.data_fld}match_links.csv', 'r') as f:
+                        match_links = f.read().split('\n')
+                    progress.update()
+                logging.info(progress.summary())
             except FileNotFoundError:
                 err_string = 'Please re run with FootballDataScraper.get_match_links(from_file=False)'
                 print(f'ERROR: {err_string}')
                 logging.error(err_string)
                 match_links = None
         else:
-            date_count = len(self.dates)
-            start_time = datetime.now()
-            match_links = []
+            os.makedirs(f'{self.data_fld}fixtures', exist_ok=True)
+            store = PageStore.from_config(config, f'{self.data_fld}fixtures/')
+            calendar = self._fixture_calendar(refresh)
+            dates = self.dates if all_dates else calendar.select(self.dates, int(config.lookahead_days))
+            logging.info(f'Requesting the fixture pages of {len(dates)} of {len(self.dates)} dates')
+            url = (config.base_url + config.url).replace(config.league_placeholder, self.league)
+            pages = {url.replace(config.date_placeholder, d['strdate']): d['strdate'] for d in dates}
+            self._fetch_pages(pages, store, self._fixture_page_ttl, refresh, completed, on_page)
 
-            for i, date_str in enumerate(self.dates):
-                date_str = date_str['strdate']
-                url = (config.base_url + config.url).replace(config.date_placeholder, date_str)
-                soup = BeautifulSoup(requests.get(url).content, 'html.parser')
+            # dict keys keep insertion order and give O(1) membership checks
+            match_links = {}
+            for d in self.dates:
+                name = d['strdate']
+                if not store.exists(name):
+                    continue
+                soup = BeautifulSoup(store.read(name), 'html.parser')
 
-                for l in soup.find_all("a", class_="AnchorLink at"):
+                games = soup.find_all("a", class_="AnchorLink at")
+                calendar.record(name, len(games))
+                for l in games:
                     href = l.get('href')
                     if f'{config.base_url}{href}' not in match_links:
-                        match_links.append(f'{config.base_url}{href}')
+                        match_links[f'{config.base_url}{href}'] = None
                         href = href.replace('match','commentary')
-                        match_links.append(f'{config.base_url}{href}')
-
-                progress = progress_bar(i+1, date_count, start_time)
-
-            logging.info(f'{progress}')
+                        match_links[f'{config.base_url}{href}'] = None
+            match_links = list(match_links)
+            calendar.save()
 
             # Save match_links to file, to save time in rerunning when needed.
-            with open(f'{config.data_fld}' + 'match_links.csv', 'w') as f:
+            with open(f'{self.data_fld}match_links.csv', 'w') as f:
                 f.write('\n'.join(match_links))
         self.match_links = match_links
 
-    @logtofile
-    def extract_game_pages(self, only_missing_files = True, refresh = False):
+    @timed_stage
+    def extract_game_pages(self, only_missing_files = True, refresh = False, completed = (), on_page = None):
         """
         Downloads and saves HTML files of game pages from a list of URLs stored in self.match_links.
+        Pages are fetched concurrently over a pooled connection, using the max_workers, requests_per_second,
+        max_retries, backoff_factor and request_timeout settings in footballscraper.config.
+        Urls that still fail after all retries are logged and skipped.
         
         Args:
-            only_missing_files (bool, optional): If True, only downloads and saves HTML files for URLs
-                that don't already exist in the destination folder. Defaults to True.
-            refresh (bool, optional): If True, downloads and saves HTML files for all URLs, regardless
-                of whether they already exist in the destination folder. Defaults to False.
+            only_missing_files (bool, optional): If True, only downloads HTML files for URLs that don't already
+                exist in the destination folder, or whose cached copy is older than its time to live
+                (final_match_ttl for finished games, live_match_ttl otherwise). Defaults to True.
+            refresh (bool, optional): If True, revalidates the HTML files for all URLs with conditional requests,
+                regardless of whether they already exist in the destination folder. Defaults to False.
+            completed (set, optional): Page names (e.g. match_123456) already fetched earlier in this run, not requested again.
+            on_page (function, optional): Called with the url, page name and outcome of each page, see _fetch_pages.
 
         Example:
             extract_game_pages(only_missing_files=True, refresh=False)
         """
-        link_count = len(self.match_links)
-        start_time = datetime.now()
-
-        for i, link in enumerate(self.match_links):
+        pages = {}
+        for link in self.match_links:
             tag = 'match' if 'match' in link else 'commentary'
-            filename = f'{config.games_fld}{tag}_{link[-6:]}.html'
+            game_id = GAME_ID.search(link)
+            pages[link] = f'{tag}_{game_id.group(1) if game_id else link[-6:]}'
 
-            if only_missing_files and refresh is False:
-                if os.path.isfile(filename) == False:
-                    response = requests.get(link).text
-                    with open(filename, 'w') as f:
-                        f.write(response)
-            else:
-                response = requests.get(link).text
-                with open(filename, 'w') as f:
-                    f.write(response)
+        store = PageStore.from_config(config, self.games_fld)
+        return self._fetch_pages(pages, store, partial(self._game_page_ttl, store), not (only_missing_files and refresh is False), completed, on_page)
+
+    def _fetch_pages(self, pages, store, page_ttl, refresh=False, completed=(), on_page=None):
+        """
+        Downloads pages through the response cache and saves each to the page store.
+
+        Pages that are saved and still within their time to live are not requested at all. The rest are requested with
+        the ETag / Last-Modified validators from the cache, a 304 keeps the saved copy.
+
+        Args:
+            pages (dict): The page name each url is saved as, keyed by url.
+            store (PageStore): Where the pages are saved.
+            page_ttl (function): Returns the time to live in seconds of a url, given the url and its page text.
+            refresh (bool, optional): If True, revalidates every page, even those within their time to live. Default is False.
+            completed (set, optional): Names of pages fetched earlier in the same run, skipped whatever their time to live
+                as long as they are saved. Default is none.
+            on_page (function, optional): Called as on_page(url, name, outcome) for every page, with 'fresh' for the pages
+                that were not requested, as the pages are saved. Default is None.
+
+        Returns:
+            dict: The outcome for each url requested: 'downloaded', 'not_modified' or 'failed'.
+        """
+        cache = ResponseCache(f'{self.data_fld}http_cache.json')
+        to_fetch = {}
+        for url, name in pages.items():
+            filename = store.find(name)
+            if filename is None:
+                to_fetch[url] = {}
+                continue
+            if name in completed:
+                continue
+            if url not in cache:
+                # Pages saved before the cache existed count as fetched when they were written
+                cache.update(url, page_ttl(url, read_page(filename)), fetched_at=os.path.getmtime(filename))
+            if refresh or not cache.is_fresh(url):
+                to_fetch[url] = cache.conditional_headers(url)
+        if on_page is not None:
+            for url, name in pages.items():
+                if url not in to_fetch:
+                    on_page(url, name, 'fresh')
+
+        link_count = len(to_fetch)
+        logging.info(f'{len(pages) - link_count} of {len(pages)} pages fresh in the cache, requesting {link_count}')
+        outcomes = {}
+        if link_count == 0:
+            cache.save()
+            return outcomes
+
+        progress = self._progress(link_count, 'fetch')
+        fetcher = PageFetcher.from_config(config)
+        try:
+            for i, (url, response, error) in enumerate(fetcher.fetch_all(to_fetch, headers=to_fetch)):
+                if response is None:
+                    outcomes[url] = 'failed'
+                    self.metrics.count('pages_failed')
+                elif response.status_code == 304:
+                    self.metrics.add_item('fetch', response.elapsed.total_seconds())
+                    cache.update(url, page_ttl(url, store.read(pages[url])), response)
+                    outcomes[url] = 'not_modified'
+                    self.metrics.count('pages_not_modified')
+                else:
+                    self.metrics.add_item('fetch', response.elapsed.total_seconds())
+                    with self.metrics.item('write'):
+                        store.write(pages[url], response.text)
+                    cache.update(url, page_ttl(url, response.text), response)
+                    outcomes[url] = 'downloaded'
+                    self.metrics.count('pages_downloaded')
+                    self.metrics.count('bytes_downloaded', len(response.content))
+                if on_page is not None:
+                    on_page(url, pages[url], outcomes[url])
+                # Save the cache now and then, so an interrupted run keeps the validators of the pages it saved
+                if (i+1) % CACHE_SAVE_EVERY == 0:
+                    cache.save()
+                progress.update()
+            progress.close()
+        finally:
+            fetcher.close()
+            cache.save()
+        logging.info(progress.summary())
+        return outcomes
+
+    def _fixture_calendar(self, refresh=False):
+        """
+        The fixture calendar of the season, with the league's schedule read again when it is older than fixture_ttl
+        (or refresh is True) and a schedule_url is configured.
+        """
+        calendar = FixtureCalendar(f'{self.data_fld}fixture_calendar.json')
+        if config.schedule_url and (refresh or not calendar.schedule_is_fresh(float(config.fixture_ttl))):
+            season = f"{self.dates[0]['strdate']}-{self.dates[-1]['strdate']}"
+            url = config.schedule_url.replace(config.league_placeholder, self.league).replace(config.date_placeholder, season)
+            fetcher = PageFetcher.from_config(config)
+            try:
+                calendar.load_schedule(fetcher, url)
+            finally:
+                fetcher.close()
+        return calendar
+
+    def _progress(self, total, task):
+        """A Progress for a loop, throttled and in the mode set by progress_mode and progress_interval in footballscraper.config."""
+        return Progress(total, task, float(config.progress_interval), config.progress_mode, float(config.progress_json_interval))
+
+    def _fixture_page_ttl(self, url, text):
+        return float(config.fixture_ttl)
+
+    def _game_page_ttl(self, store, url, text):
+        """
+        Games that have finished rarely change, games that have not are revalidated after live_match_ttl.
+        Commentary pages do not always show the game status, so they are judged by the saved match page of the same game.
+        """
+        if 'commentary' in url and not GAME_FINISHED.search(text):
+            game_id = GAME_ID.search(url)
+            match_file = store.find(f'match_{game_id.group(1)}') if game_id else None
+            text = read_page(match_file) if match_file else ''
+        return float(config.final_match_ttl) if GAME_FINISHED.search(text) else float(config.live_match_ttl)
+
+    def _parse_files(self, parse_func, files, workers=1):
+        """
+        Runs parse_func over files, either in this process or across a pool of worker processes.
+
+        Args:
+            parse_func (function): Module level function that turns one file into plain records.
+            files (list): Paths of the HTML files to parse.
+            workers (int, optional): Number of worker processes. 1 parses serially in this process. Default is 1.
+
+        Yields:
+            The result of parse_func for each file, in the same order as files.
+        """
+        # Files are timed where they are parsed, so the parse times from worker processes are per file too
+        timed_parse = partial(_timed_parse, parse_func)
+        if workers > 1 and len(files) > 1:
+            chunksize = max(1, len(files) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(timed_parse, files, chunksize=chunksize)
+                yield from self._record_parse_times(results)
+        else:
+            yield from self._record_parse_times(map(timed_parse, files))
+
+    def _record_parse_times(self, results):
+        for seconds, result in results:
+            self.metrics.add_item('parse', seconds)
+            self.metrics.count('pages_parsed')
+            yield result
+
+    def _parse_changed_files(self, parse_func, files, workers, manifest_file):
+        """
+        Parses only the files that are new or changed since the last run, reusing the records stored in the manifest for the rest.
+
+        A file is unchanged when its size and mtime match the manifest, or failing that when its content hash does.
+        Entries written by an older PARSER_VERSION are always parsed again.
+
+        The manifest is newline delimited JSON, one entry (path, size, mtime, sha1 and parsed records) per file. Only the
+        position of each entry is kept while deciding what changed, the records are read back one file at a time as they are
+        yielded, and parsed records are yielded as they come out of the workers, so no more than one file's records is held.
+
+        A new manifest with an entry for every file in files, so entries for files that no longer exist are dropped, is
+        written alongside as the records are yielded. It only replaces the old one when the caller calls the returned save
+        function, once the outputs built from the records have been written, so a run interrupted before then parses the
+        same files again next time rather than leaving outputs older than the manifest.
+
+        Args:
+            parse_func (function): Module level function that turns one file into plain records.
+            files (list): Paths of the HTML files to parse.
+            workers (int): Number of worker processes used for the files that need parsing.
+            manifest_file (str): Path of the NDJSON manifest.
+
+        Returns:
+            tuple: A generator of the records for each file in the same order as files, whether anything changed since the
+                last run and a function that saves the manifest once the generator is used up.
+        """
+        # Path of each entry to the entry without its records and its offset in the manifest
+        manifest = {}
+        try:
+            with open(manifest_file, 'rb') as f:
+                offset = 0
+                for line in f:
+                    entry = json.loads(line)
+                    del entry['records']
+                    manifest[entry['path']] = (entry, offset)
+                    offset += len(line)
+        except FileNotFoundError:
+            pass
+
+        entries = {}
+        changed_files = []
+        for file in files:
+            stat = os.stat(file)
+            entry, offset = manifest.get(file, (None, None))
+            if entry is not None and entry.get('parser_version') != PARSER_VERSION:
+                entry = None
+            if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                entries[file] = (entry, offset)
+                continue
+            sha1 = _file_sha1(file)
+            if entry is not None and entry['sha1'] == sha1:
+                entry.update({'size':stat.st_size, 'mtime':stat.st_mtime})
+                entries[file] = (entry, offset)
+                continue
+            entries[file] = ({'path':file, 'size':stat.st_size, 'mtime':stat.st_mtime, 'sha1':sha1, 'parser_version':PARSER_VERSION}, None)
+            changed_files.append(file)
+
+        logging.info(f'{len(changed_files)} of {len(files)} files new or changed since the last run')
+        changed = len(changed_files) > 0 or entries.keys() != manifest.keys()
+        tmp_manifest_file = f'{manifest_file}.tmp'
+
+        def records():
+            parsed = self._parse_files(parse_func, changed_files, workers)
+            old = open(manifest_file, 'rb') if len(changed_files) < len(files) else None
+            new = open(tmp_manifest_file, 'w') if changed else None
+            try:
+                for file in files:
+                    entry, offset = entries[file]
+                    if offset is None:
+                        file_records = next(parsed)
+                    else:
+                        old.seek(offset)
+                        file_records = json.loads(old.readline())['records']
+                    if new is not None:
+                        new.write(json.dumps({**entry, 'records':file_records}))
+                        new.write('\n')
+                    yield file_records
+            finally:
+                for f in (old, new):
+                    if f is not None:
+                        f.close()
+
+        def save_manifest():
+            if changed:
+                os.replace(tmp_manifest_file, manifest_file)
 
-            progress = progress_bar(i+1, link_count, start_time)
-        logging.info(f'{progress}')
+        return records(), changed, save_manifest
 
-    def _convert_to_london_time(self, timestamp):
+    @staticmethod
+    def _convert_to_london_time(timestamp):
         dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))  # Convert the "Z" to "+00:00" for timezone offset
         london_tz = pytz.timezone("Europe/London")
         dt_london = dt.astimezone(london_tz)
@@ -179,13 +515,152 @@ class FootballDataScraper():
         formatted_time_london = dt_london.strftime("%Y-%m-%d %H:%M")
         return formatted_time_london
 
-    @logtofile
-    def get_match_data(self, from_file = True):
+    def write_metrics(self):
+        """
+        Writes the timings and counters of this run so far to metrics_<run_id>.json in the log folder, see code/metrics.py.
+
+        Returns:
+            str: Path of the metrics file.
+        """
+        path = self.metrics.write(self.log_fld)
+        logging.info(f'Metrics written to {path}')
+        return path
+
+    @property
+    def aggregates(self):
+        """
+        The SeasonAggregates built by get_match_data (see code/aggregates.py), loaded from the output folder if the
+        match data has not been parsed in this session.
+        """
+        if self._aggregates is None:
+            self._aggregates = SeasonAggregates.load(f'{self.output_fld}aggregates.json')
+        return self._aggregates
+
+    def top_players(self, stat, n=5, team_id=None):
+        """The n players with the highest total of a data-stat, e.g. top_players('totalGoals'). See SeasonAggregates.top_players."""
+        return self.aggregates.top_players(stat, n, team_id)
+
+    def top_teams(self, stat, n=5):
+        """The n teams with the highest total of a team or player stat, e.g. top_teams('yellowCards'). See SeasonAggregates.top_teams."""
+        return self.aggregates.top_teams(stat, n)
+
+    def player_totals(self, player_id):
+        """A player's appearances and summed data-stats. See SeasonAggregates.player_totals."""
+        return self.aggregates.player_totals(player_id)
+
+    def team_form(self, team_id, last=5):
+        """A team's latest results, most recent first. See SeasonAggregates.team_form."""
+        return self.aggregates.team_form(team_id, last)
+
+    def standings(self):
+        """The league table from the finished matches. See SeasonAggregates.standings."""
+        return self.aggregates.standings()
+
+    def venue_attendance(self, n=None):
+        """Venues by average attendance. See SeasonAggregates.venue_attendance."""
+        return self.aggregates.venue_attendance(n)
+
+    def iter_records(self, name):
         """
-        Retrieves match data from either pre-existing JSON files or from HTML files, and stores the data in dictionaries.
+        Yields the records of one output dataset at a time, without loading the rest of the dataset or any other dataset.
 
         Args:
-            from_file (bool, optional): If True, reads existing JSON files to fetch data. If False, reads HTML files to extract data. Default is True.
+            name (str): One of matches, team_details, team_stats, player_details, player_stats or commentary.
+        """
+        if name not in DATASETS:
+            raise ValueError(f'Unknown dataset {name}, expected one of {", ".join(DATASETS)}')
+        return iter_dataset(self.output_fld, name)
+
+    def load_dataset(self, name):
+        """
+        Loads a single output dataset into its attribute, e.g. load_dataset('player_stats') sets self.player_stats.
+        Details datasets are loaded as dictionaries keyed by id, team_stats and player_stats as StatTables, the rest as lists.
+        """
+        records = self.iter_records(name)
+        if name in DETAIL_DATASETS:
+            data = {record['id']: record for record in records}
+        elif name in STAT_DATASETS:
+            data = StatTable.from_records(name, records)
+        else:
+            data = list(records)
+        setattr(self, name, data)
+        return data
+
+    @timed_stage
+    def export_tables(self, datasets=None, fmt=None):
+        """
+        Exports output datasets as typed, zstd compressed columnar tables (<dataset>.parquet or <dataset>.arrow) in the output folder.
+        Stats are stored as integers, date_time as a timestamp and team, venue and other repeated ids as categoricals.
+        Requires pyarrow.
+
+        Args:
+            datasets (list, optional): Datasets to export. Default is all six.
+            fmt (str, optional): 'parquet', or 'feather' for arrow IPC files. Default is table_format in footballscraper.config.
+        """
+        fmt = fmt or config.table_format
+        datasets = datasets or DATASETS
+        with self._progress(len(datasets), 'export_tables') as progress:
+            for name in datasets:
+                with self.metrics.item('serialize'):
+                    table = build_table(name, self.iter_records(name))
+                with self.metrics.item('write'):
+                    write_table(table, f'{self.output_fld}{name}{TABLE_FORMATS[fmt]}', fmt)
+                progress.update()
+        logging.info(progress.summary())
+
+    @timed_stage
+    def export_sqlite(self, path=None, datasets=None):
+        """
+        Loads output datasets into an SQLite warehouse (see code/warehouse.py), upserting so seasons can be added to the same database.
+
+        Args:
+            path (str, optional): Database file. Default is sqlite_db in footballscraper.config.
+            datasets (list, optional): Datasets to load. Default is all six.
+
+        Returns:
+            Warehouse: The open warehouse, ready for indexed queries with Warehouse.query.
+        """
+        warehouse = Warehouse(path or config.sqlite_db)
+        datasets = datasets or DATASETS
+        with self._progress(len(datasets), 'export_sqlite') as progress:
+            for name in datasets:
+                records = self.iter_records(name)
+                if name == 'commentary':
+                    records = flatten_commentary(records)
+                with self.metrics.item('write'):
+                    count = warehouse.upsert(WAREHOUSE_TABLES[name], records)
+                logging.info(f'{count} {name} records loaded into {warehouse.path}')
+                progress.update()
+        logging.info(progress.summary())
+        return warehouse
+
+    def read_table(self, name, columns=None, fmt=None, filters=None):
+        """
+        Reads an exported table memory mapped, loading only the columns asked for.
+
+        Args:
+            name (str): The dataset, e.g. 'player_stats'.
+            columns (list, optional): Columns to load. Default is every column.
+            fmt (str, optional): 'parquet' or 'feather'. Default is table_format in footballscraper.config.
+            filters (list, optional): Only the rows matching these, e.g. read_table('commentary', filters=[('type', '=', EventType.GOAL.value)]).
+
+        Returns:
+            pyarrow.Table: Convert with .to_pandas() for analysis.
+        """
+        fmt = fmt or config.table_format
+        return read_table(f'{self.output_fld}{name}{TABLE_FORMATS[fmt]}', columns, fmt, filters)
+
+    @timed_stage
+    def get_match_data(self, from_file = True, workers = 1, incremental = True, datasets = None):
+        """
+        Retrieves match data from either pre-existing NDJSON files or from HTML files, and stores the data in dictionaries.
+
+        Args:
+            from_file (bool, optional): If True, reads existing NDJSON files to fetch data. If False, reads HTML files to extract data. Default is True.
+            workers (int, optional): Number of processes used to parse the HTML files when from_file is False. Default is 1.
+            incremental (bool, optional): If True, only parses HTML files that are new or changed since the last run and reuses the
+                records kept in the output folder manifest for the rest. Default is True.
+            datasets (list, optional): When from_file is True, only loads these datasets, e.g. ['matches']. Default is all five.
 
         This function fetches the following data:
             1. Matches
@@ -199,212 +674,486 @@ class FootballDataScraper():
             - self.player_details
             - self.player_stats
             - self.team_details
-            - self.teams_stats
+            - self.team_stats
+
+        player_stats and team_stats are StatTables, typed columns with ids stored once; StatTable.to_pandas gives a DataFrame.
+
+        When from_file is False, the player, team and venue totals behind top_players, top_teams, player_totals, team_form,
+        standings and venue_attendance are built as the records are merged and saved to aggregates.json.
 
-        When from_file is set to False, the function also writes the data to JSON files.
-        """ 
+        When from_file is set to False, the function also writes the data to newline delimited JSON files (<dataset>.ndjson),
+        record by record as the HTML files are parsed or, when incremental, read back from the manifest.
+        """
         if from_file:
             logging.info(f'Getting match data from file')
-            start_time = datetime.now()
-            progress = progress_bar(0, 5, start_time)
-            with open(f'{config.output_fld}matches.json', 'r') as f:
-                self.matches = json.load(f)
-            progress = progress_bar(1, 5, start_time)
-            with open(f'{config.output_fld}player_details.json', 'r') as f:
-                self.player_details = json.load(f)
-            progress = progress_bar(2, 5, start_time)
-            with open(f'{config.output_fld}player_stats.json', 'r') as f:
-                self.player_stats = json.load(f)
-            progress = progress_bar(3, 5, start_time)
-            with open(f'{config.output_fld}team_details.json', 'r') as f:
-                self.team_details = json.load(f)
-            progress = progress_bar(4, 5, start_time)
-            with open(f'{config.output_fld}team_stats.json', 'r') as f:
-                self.team_stats = json.load(f)
-            progress = progress_bar(5, 5, start_time)
-            logging.info(f'{progress}')
+            datasets = datasets or MATCH_DATASETS
+            with self._progress(len(datasets), 'get_match_data') as progress:
+                for name in datasets:
+                    self.load_dataset(name)
+                    progress.update()
+            logging.info(progress.summary())
         else:
-            match_files = glob.glob(f'{config.games_fld}/match_*.html')
+            match_files = PageStore.from_config(config, self.games_fld).list('match_')
             
             # dictionarys to store data
             matches = []
-            team_stats = []
+            team_stats = StatTable('team_stats')
             team_details = {}
             player_details = {}
-            player_stats = []
-
-            sides = ['home', 'away']
-            match_files_count = len(match_files)
-            start_time = datetime.now()
-
-            for i, match_file in enumerate(match_files):
-                with open(match_file) as fp:
-                    match = {}
-                    team = {}
-                    player = {}
-                    
-                    soup = BeautifulSoup(fp, 'html.parser')
-                    
-                    match_id = 'M' + re.findall('.match_(\d+)\.html', match_file)[0]
-                    match['id'] = match_id
-                    match['venue'] = soup.find('li',{'class': "venue"}).div.text.replace('VENUE: ','')
-                    match['date_time'] = self._convert_to_london_time(soup.find('li', {'class':'subdued'}).div.span.get('data-date'))
-                    match['address'] = soup.find('div',{'class': "address"}).span.text
-                    if soup.find(string=re.compile('ATTENDANCE')) != None:
-                        match['attendance'] = soup.find(string=re.compile('ATTENDANCE')).replace(',','').replace('ATTENDANCE: ','')
-                    if soup.find(string=re.compile('REFEREE')) != None:
-                        match['referee'] = soup.find(string=re.compile('REFEREE')).text.replace(',','').replace('REFEREE: ','').strip()
-                    match['status'] = soup.find('div',{'class': "game-status"}).find('span',{'class': "game-time"}).text 
-
-                    for side in sides: #home or away
-                        wrong_side = [x for x in sides if x != side ][0]# Home and Away mixed up on website
-
-                        game_details = soup.find('div', {'class':'competitors'}).find('div', {'class':re.compile(f'team {wrong_side}')})
-                        team_id = game_details.find('a', {'class':re.compile(f'team-name')}).get('data-clubhouse-uid').replace('s:600~t:','T')
-                        if team_id not in team_details.keys():
-                            team_details[team_id] = {}
-                            team_details[team_id]['id'] = team_id
-                            team_details[team_id]['long_name'] = game_details.find('span', {'class':'long-name'}).text
-                            team_details[team_id]['short_name'] = game_details.find('span', {'class':'short-name'}).text
-                            team_details[team_id]['abbrev'] = game_details.find('span', {'class':'abbrev'}).text
-                            team_details[team_id]['page_url'] = game_details.find('a', {'class':f'team-name'}).get('href')
-
-                        match[f'{side}_side_id'] = team_id
-
-                        #Stats
-                        if match['status'] == 'FT':
-                            
-                            team['id'] = team_id
-                            team['match_id'] = match_id
-                            team['side'] = side
-                            team['score'] = soup.find('span',{'data-home-away': {side}, 'data-stat': "score"}).text.replace('\n','').replace('\t','')
-
-                            match[f'{side}_score'] = team['score']
-
-                            team['fouls_committed'] = soup.find('td',{'data-home-away': side, "data-stat":"foulsCommitted"}).text
-                            team['yellow_cards'] = soup.find('td',{'data-home-away': side, "data-stat":"yellowCards"}).text
-                            team['red_cards'] = soup.find('td',{'data-home-away': side, "data-stat":"redCards"}).text
-                            team['offsides'] = soup.find('td',{'data-home-away': side, "data-stat":"offsides"}).text
-                            team['corners'] = soup.find('td',{'data-home-away': side, "data-stat":"wonCorners"}).text
-                            team['saves'] = soup.find('td',{'data-home-away': side, "data-stat":"saves"}).text
-                            team['possession'] = soup.find('span',{'data-home-away': side, "data-stat":"possessionPct"}).text.replace('%','')
-                            shots_summary = soup.find('span',{'data-home-away': side, "data-stat":"shotsSummary"}).text
-                            team['shots_on_target'] = int(re.findall('\((\d+)\)', shots_summary)[0])
-                            team['shots_off_target'] = int(re.findall('^\d+', shots_summary)[0]) - team['shots_on_target']
-
-                            if side == 'home':
-                                athletes = soup.find('div',{'class':'content-tab','style':'display: block;'})
-                            else:
-                                athletes = soup.find('div',{'class':'content-tab','style':'display: none;'})
-                            athletes = athletes.find_all('div', {'class':'accordion-item'})
-
-                            starting_lineup = 0
-                            prev_player = ''
-
-                            for athlete in athletes:
-                                player = {}
-
-                                player_id = athlete.get('data-id')
-                                player['id'] = 'P'+player_id
-                                
-                                player_no = athlete.find('span',{'style':re.compile('.*display:inline-block.*')})
-                                player_name = athlete.find('a',{'data-player-uid':re.compile(f'.*'+player_id)}).text.strip()
-
-                                if player['id'] not in player_details.keys():
-                                    player_details[player['id']] = {}
-                                    player_details[player['id']]['id'] = player['id']
-                                    player_details[player['id']]['team_id'] = team_id
-                                    player_details[player['id']]['player_link'] = athlete.find('a',{'data-player-uid':re.compile(f'.*'+player_id)}).get('href')
-                                    player_details[player['id']]['player_name'] = player_name
-                                    player_details[player['id']]['player_no'] = player_no
-                                
-                                starting_lineup = starting_lineup + 0 if player_no is None else starting_lineup + 1
-                                
-
-                                is_sub = True if player_no is None or starting_lineup >11 else False
-                                player['is_sub'] = is_sub
-                                player['played'] = True if starting_lineup <=11 else False
-                                
-                                if is_sub:
-                                    player['subbed_for'] = prev_player if is_sub else 'None'
-                                    player['subbed_time'] = athlete.find('span',{'class':'icon-soccer-substitution-before'}).text if is_sub and starting_lineup <=11 else 'None'
-                                
-                                player['player_no'] = athlete.find(string=re.compile('.* .*')).text.strip() if player_no is None else player_no.text
-                                player_details[player['id']]['player_no'] = player['player_no']
-                                for data_stat in athlete.find_all('span', {'data-stat':re.compile('.*')}):
-                                    player[data_stat.get('data-stat')] =  data_stat.text
-
-                                prev_player = player_name
-
-                                player_stats.append(player)
-                        team_stats.append(team)
-                matches.append(match)
-                progress = progress_bar(i+1, match_files_count, start_time)
-                logging.info(f'{progress}')
+            player_stats = StatTable('player_stats')
+            aggregates = SeasonAggregates()
+
+            progress = self._progress(len(match_files), 'get_match_data')
+
+            if incremental:
+                results, changed, save_manifest = self._parse_changed_files(parse_match_file, match_files, workers, f'{self.output_fld}match_manifest.ndjson')
+            else:
+                results, changed, save_manifest = self._parse_files(parse_match_file, match_files, workers), True, None
+
+            # Records are streamed to the outputs as each file is merged, the details once every file has been seen
+            write = changed or not all(dataset_exists(self.output_fld, name) for name in MATCH_DATASETS)
+            writer = NdjsonWriter(self.output_fld, MATCH_DATASETS) if write else None
+            try:
+                for result in results:
+                    matches.append(result['match'])
+                    team_stats.extend(result['team_stats'])
+                    player_stats.extend(result['player_stats'])
+                    aggregates.add_match(result)
+                    if writer is not None:
+                        with self.metrics.item('serialize'):
+                            writer.write('matches', [result['match']])
+                            writer.write('team_stats', result['team_stats'])
+                            writer.write('player_stats', result['player_stats'])
+                        self.metrics.count('records_emitted', 1 + len(result['team_stats']) + len(result['player_stats']))
+                    for team_id, team in result['team_details'].items():
+                        if team_id not in team_details:
+                            team_details[team_id] = team
+                    # First appearance keeps the player's details, the shirt number is taken from the latest one
+                    for player_id, player in result['player_details'].items():
+                        if player_id not in player_details:
+                            player['team_id'] = sys.intern(player['team_id'])
+                            player_details[player_id] = player
+                        else:
+                            player_details[player_id]['player_no'] = player['player_no']
+                    progress.update()
+                progress.close()
+                logging.info(progress.summary())
+                if writer is not None:
+                    with self.metrics.item('serialize'):
+                        writer.write('team_details', team_details.values())
+                        writer.write('player_details', player_details.values())
+                    self.metrics.count('records_emitted', len(team_details) + len(player_details))
+                    with self.metrics.item('write'):
+                        writer.close()
+                else:
+                    logging.info('No match files changed, outputs left as they are')
+            except BaseException:
+                if writer is not None:
+                    writer.abort()
+                raise
+            aggregates.add_details(team_details, player_details)
+            if writer is not None or not os.path.isfile(f'{self.output_fld}aggregates.json'):
+                aggregates.save(f'{self.output_fld}aggregates.json')
+            # Only once every output is written, so an interrupted run is parsed again rather than skipped next time
+            if save_manifest is not None:
+                save_manifest()
+            self._aggregates = aggregates
             self.matches = matches
             self.player_details = player_details
             self.player_stats = player_stats
             self.team_details = team_details
-            self.teams_stats = team_stats
-
-            data_dict = {'matches':matches, 'team_details':team_details, 'team_stats':team_stats, 'player_details':player_details, 'player_stats':player_stats}
-            for key, data in data_dict.items():
-                with open (f'{config.output_fld}{key}.json', 'w') as f:
-                    json.dump(data,f)
+            self.team_stats = team_stats
 
-    @logtofile
-    def get_commentary_data(self, from_file = True):
+    @timed_stage
+    def get_commentary_data(self, from_file = True, workers = 1, incremental = True):
         """
-        Retrieves match commentary data from either pre-existing JSON files or from HTML files, and stores the data in a dictionary.
+        Retrieves match commentary data from either pre-existing NDJSON files or from HTML files, and stores the data in a dictionary.
 
         Args:
-            from_file (bool, optional): If True, reads existing JSON files to fetch data. If False, reads HTML files to extract data. Default is True.
+            from_file (bool, optional): If True, reads existing NDJSON files to fetch data. If False, reads HTML files to extract data. Default is True.
+            workers (int, optional): Number of processes used to parse the HTML files when from_file is False. Default is 1.
+            incremental (bool, optional): If True, only parses HTML files that are new or changed since the last run and reuses the
+                records kept in the output folder manifest for the rest. Default is True.
 
         This function fetches the following data:
             1. Match ID
-            2. Commentary (order, type, timestamp, description)
+            2. Commentary events (order, minute, added_time, type, description)
 
         The data is stored in the following dictionary:
             - self.commentary
 
-        When from_file is set to False, the function also writes the data to a JSON file (commentary.json).
+        When from_file is set to False, the function also writes the data to a newline delimited JSON file (commentary.ndjson).
         """
         if from_file:
             logging.info(f'Getting match data from file')
-            start_time = datetime.now()
-            progress = progress_bar(0, 1, start_time)
-            with open(f'{config.output_fld}commentary.json', 'r') as f:
-                self.commentary = json.load(f)
-            progress = progress_bar(1, 1, start_time)
-            logging.info(f'{progress}')
+            with self._progress(1, 'get_commentary_data') as progress:
+                self.load_dataset('commentary')
+                progress.update()
+            logging.info(progress.summary())
         else:
-            commentary_files = glob.glob(f'{config.games_fld}/commentary_*.html')
+            commentary_files = PageStore.from_config(config, self.games_fld).list('commentary_')
             matches = []
 
-            commentary_files_count = len(commentary_files)
-            start_time = datetime.now()
-
-            for i, commentary_file in enumerate(commentary_files):
-                match = {}
-                with open(commentary_file) as fp:
-                    soup = BeautifulSoup(fp, 'html.parser')
-
-                    match['id'] = re.findall('.commentary_(\d+)\.html', commentary_file)[0]
-                    comments = []
-                    for comment in soup.find_all('tr',{'data-id': re.compile('comment-*')}):
-                        entrie = {}
-                        entrie['order'] = re.findall('.*-(\d+)',comment.get('data-id'))[0]
-                        entrie['type'] = comment.get('data-type')
-                        entrie['timestamp'] = comment.find('td', {'class':'time-stamp'}).text.replace("'",'').replace('-','0')
-                        entrie['description'] = comment.find('td', {'class':'game-details'}).text.strip()
-                        comments.append(entrie)
-                    match['comments'] = comments
-                matches.append(match)
-
-                self.commentary = matches
-
-                progress = progress_bar(i+1, commentary_files_count, start_time)
-            logging.info(f'{progress}')
-
-            with open (f'{config.output_fld}commentary.json', 'w') as f:
-                    json.dump(matches,f)
+            progress = self._progress(len(commentary_files), 'get_commentary_data')
+
+            if incremental:
+                results, changed, save_manifest = self._parse_changed_files(parse_commentary_file, commentary_files, workers, f'{self.output_fld}commentary_manifest.ndjson')
+            else:
+                results, changed, save_manifest = self._parse_files(parse_commentary_file, commentary_files, workers), True, None
+
+            write = changed or not dataset_exists(self.output_fld, 'commentary')
+            writer = NdjsonWriter(self.output_fld, ['commentary']) if write else None
+            try:
+                for match in results:
+                    matches.append(match)
+                    if writer is not None:
+                        with self.metrics.item('serialize'):
+                            writer.write('commentary', [match])
+                        self.metrics.count('records_emitted')
+                    progress.update()
+                progress.close()
+                logging.info(progress.summary())
+                if writer is not None:
+                    with self.metrics.item('write'):
+                        writer.close()
+                else:
+                    logging.info('No commentary files changed, output left as it is')
+            except BaseException:
+                if writer is not None:
+                    writer.abort()
+                raise
+            if save_manifest is not None:
+                save_manifest()
+            self.commentary = matches
+
+def season_bounds(season):
+    """
+    Returns the first and last date of a season, season_start_dt and season_end_dt in footballscraper.config moved to the
+    season starting in the given year.
+    """
+    start = datetime.strptime(config.season_start_dt,'%Y-%m-%d')
+    end = datetime.strptime(config.season_end_dt,'%Y-%m-%d')
+    return start.replace(year=season), end.replace(year=season + end.year - start.year)
+
+
+def _timed_parse(parse_func, filename):
+    """Returns the seconds taken to parse a file along with its records."""
+    start = time.perf_counter()
+    result = parse_func(filename)
+    return time.perf_counter() - start, result
+
+
+def _file_sha1(filename):
+    """Returns the sha1 hex digest of a file's content, read in chunks."""
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def _match_page_soup(html):
+    """
+    Builds a soup of the match page regions only. Falls back to a full parse when a region the parser
+    relies on was not captured, so an unexpected page layout never changes the output.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=MATCH_PAGE_REGIONS)
+    for marker in ('ATTENDANCE', 'REFEREE'):
+        if marker in html and soup.find(string=re.compile(marker)) is None:
+            return BeautifulSoup(html, HTML_PARSER)
+    if soup.find('li',{'class': "venue"}) is None or soup.find('div',{'class': 'competitors'}) is None:
+        return BeautifulSoup(html, HTML_PARSER)
+    return soup
+
+
+def _side_stats(soup):
+    """
+    Collects every home/away stat cell in a single pass over the page.
+
+    Returns:
+        dict: The first matching tag for each (tag name, side, data-stat), e.g. ('td', 'home', 'saves').
+    """
+    side_stats = {}
+    for cell in soup.find_all(attrs={'data-home-away': True, 'data-stat': True}):
+        side_stats.setdefault((cell.name, cell.get('data-home-away'), cell.get('data-stat')), cell)
+    return side_stats
+
+
+def _first(element, xpath, **variables):
+    """The first element or text found by one of MATCH_XPATHS, raising IndexError when there is none."""
+    return MATCH_XPATHS[xpath](element, **variables)[0]
+
+
+def _parse_match_tree(page, match_id):
+    """
+    Reads the records of parse_match_file from an lxml tree with precompiled XPaths, without building a soup.
+    Gives the same records as the BeautifulSoup path, and raises when the page is not laid out as expected so the caller
+    can fall back to it.
+    """
+    team_stats = []
+    team_details = {}
+    player_details = {}
+    player_stats = []
+    sides = ['home', 'away']
+    side_stats = None
+
+    root = lxml.html.document_fromstring(page)
+
+    match = {'id': match_id}
+    match['venue'] = _first(_first(root, 'venue'), 'div').text_content().replace('VENUE: ','')
+    match['date_time'] = FootballDataScraper._convert_to_london_time(_first(_first(_first(root, 'subdued'), 'div'), 'span').get('data-date'))
+    match['address'] = _first(_first(root, 'address'), 'span').text_content()
+    attendance = MATCH_XPATHS['marker'](root, marker='ATTENDANCE')
+    if attendance:
+        match['attendance'] = str(attendance[0]).replace(',','').replace('ATTENDANCE: ','')
+    referee = MATCH_XPATHS['marker'](root, marker='REFEREE')
+    if referee:
+        match['referee'] = str(referee[0]).replace(',','').replace('REFEREE: ','').strip()
+    match['status'] = _first(_first(root, 'game_status'), 'game_time').text_content()
+
+    competitors = _first(root, 'competitors')
+    for side in sides:
+        team = {}
+        wrong_side = 'away' if side == 'home' else 'home' # Home and Away mixed up on website
+
+        game_details = _first(competitors, 'team', name=f'team {wrong_side}')
+        team_id = _first(game_details, 'team_name').get('data-clubhouse-uid').replace('s:600~t:','T')
+        if team_id not in team_details:
+            team_details[team_id] = {'id': team_id,
+                                     'long_name': _first(game_details, 'long_name').text_content(),
+                                     'short_name': _first(game_details, 'short_name').text_content(),
+                                     'abbrev': _first(game_details, 'abbrev').text_content(),
+                                     'page_url': _first(game_details, 'team_link').get('href')}
+
+        match[f'{side}_side_id'] = team_id
+
+        if match['status'] == 'FT':
+            if side_stats is None:
+                side_stats = {}
+                for cell in MATCH_XPATHS['side_stats'](root):
+                    side_stats.setdefault((cell.tag, cell.get('data-home-away'), cell.get('data-stat')), cell.text_content())
+
+            team['id'] = team_id
+            team['match_id'] = match_id
+            team['side'] = side
+            team['score'] = side_stats[('span', side, 'score')].replace('\n','').replace('\t','')
+
+            match[f'{side}_score'] = team['score']
+
+            team['fouls_committed'] = side_stats[('td', side, 'foulsCommitted')]
+            team['yellow_cards'] = side_stats[('td', side, 'yellowCards')]
+            team['red_cards'] = side_stats[('td', side, 'redCards')]
+            team['offsides'] = side_stats[('td', side, 'offsides')]
+            team['corners'] = side_stats[('td', side, 'wonCorners')]
+            team['saves'] = side_stats[('td', side, 'saves')]
+            team['possession'] = side_stats[('span', side, 'possessionPct')].replace('%','')
+            shots_summary = side_stats[('span', side, 'shotsSummary')]
+            team['shots_on_target'] = int(SHOTS_ON_TARGET.findall(shots_summary)[0])
+            team['shots_off_target'] = int(SHOTS_TOTAL.findall(shots_summary)[0]) - team['shots_on_target']
+
+            lineup = _first(root, 'lineup', style='display: block;' if side == 'home' else 'display: none;')
+
+            starting_lineup = 0
+            prev_player = ''
+
+            for athlete in MATCH_XPATHS['athletes'](lineup):
+                player_id = athlete.get('data-id')
+                player = {'id': 'P'+player_id, 'match_id': match_id, 'team_id': team_id}
+
+                player_no = MATCH_XPATHS['player_no'](athlete)
+                player_no = player_no[0] if player_no else None
+                player_link = _first(athlete, 'player_link', id=player_id)
+                player_name = player_link.text_content().strip()
+
+                if player['id'] not in player_details:
+                    player_details[player['id']] = {'id': player['id'], 'team_id': team_id,
+                                                    'player_link': player_link.get('href'), 'player_name': player_name}
+
+                starting_lineup = starting_lineup + 0 if player_no is None else starting_lineup + 1
+
+                is_sub = True if player_no is None or starting_lineup >11 else False
+                player['is_sub'] = is_sub
+                player['played'] = True if starting_lineup <=11 else False
+
+                if is_sub:
+                    player['subbed_for'] = prev_player
+                    player['subbed_time'] = _first(athlete, 'subbed_time').text_content() if starting_lineup <=11 else 'None'
+
+                player['player_no'] = str(_first(athlete, 'sub_no')).strip() if player_no is None else player_no.text_content()
+                player_details[player['id']]['player_no'] = player['player_no']
+                for data_stat in MATCH_XPATHS['data_stats'](athlete):
+                    player[data_stat.get('data-stat')] = data_stat.text_content()
+
+                prev_player = player_name
+
+                player_stats.append(player)
+        team_stats.append(team)
+    return {'match':match, 'team_stats':team_stats, 'team_details':team_details, 'player_details':player_details, 'player_stats':player_stats}
+
+
+def parse_match_file(match_file):
+    """
+    Parses a single match page into plain records. Module level so it can be sent to worker processes.
+
+    Args:
+        match_file (str): Path of the match_<id>.html file, compressed or not.
+
+    Returns:
+        dict: 'match' (dict), 'team_stats' (list), 'team_details' (dict), 'player_details' (dict) and
+              'player_stats' (list) for this match only. Details are keyed by id, as in the JSON outputs.
+    """
+    team_stats = []
+    team_details = {}
+    player_details = {}
+    player_stats = []
+    sides = ['home', 'away']
+    side_stats = None
+
+    match = {}
+    player = {}
+
+    page = read_page(match_file)
+    match_id = 'M' + MATCH_FILE_ID.findall(match_file)[0]
+    if HTML_PARSER == 'lxml':
+        try:
+            return _parse_match_tree(page, match_id)
+        except (IndexError, KeyError, AttributeError, TypeError, ValueError) as e:
+            logging.debug(f'{match_file} is not laid out as expected, parsing it with BeautifulSoup: {e!r}')
+
+    soup = _match_page_soup(page)
+
+    match['id'] = match_id
+    match['venue'] = soup.find('li',{'class': "venue"}).div.text.replace('VENUE: ','')
+    match['date_time'] = FootballDataScraper._convert_to_london_time(soup.find('li', {'class':'subdued'}).div.span.get('data-date'))
+    match['address'] = soup.find('div',{'class': "address"}).span.text
+    if soup.find(string=re.compile('ATTENDANCE')) != None:
+        match['attendance'] = soup.find(string=re.compile('ATTENDANCE')).replace(',','').replace('ATTENDANCE: ','')
+    if soup.find(string=re.compile('REFEREE')) != None:
+        match['referee'] = soup.find(string=re.compile('REFEREE')).text.replace(',','').replace('REFEREE: ','').strip()
+    match['status'] = soup.find('div',{'class': "game-status"}).find('span',{'class': "game-time"}).text 
+
+    for side in sides: #home or away
+        team = {}
+        wrong_side = [x for x in sides if x != side ][0]# Home and Away mixed up on website
+
+        game_details = soup.find('div', {'class':'competitors'}).find('div', {'class':re.compile(f'team {wrong_side}')})
+        team_id = game_details.find('a', {'class':re.compile(f'team-name')}).get('data-clubhouse-uid').replace('s:600~t:','T')
+        if team_id not in team_details.keys():
+            team_details[team_id] = {}
+            team_details[team_id]['id'] = team_id
+            team_details[team_id]['long_name'] = game_details.find('span', {'class':'long-name'}).text
+            team_details[team_id]['short_name'] = game_details.find('span', {'class':'short-name'}).text
+            team_details[team_id]['abbrev'] = game_details.find('span', {'class':'abbrev'}).text
+            team_details[team_id]['page_url'] = game_details.find('a', {'class':f'team-name'}).get('href')
+
+        match[f'{side}_side_id'] = team_id
+
+        #Stats
+        if match['status'] == 'FT':
+            if side_stats is None:
+                side_stats = _side_stats(soup)
+
+            team['id'] = team_id
+            team['match_id'] = match_id
+            team['side'] = side
+            team['score'] = side_stats[('span', side, 'score')].text.replace('\n','').replace('\t','')
+
+            match[f'{side}_score'] = team['score']
+
+            team['fouls_committed'] = side_stats[('td', side, 'foulsCommitted')].text
+            team['yellow_cards'] = side_stats[('td', side, 'yellowCards')].text
+            team['red_cards'] = side_stats[('td', side, 'redCards')].text
+            team['offsides'] = side_stats[('td', side, 'offsides')].text
+            team['corners'] = side_stats[('td', side, 'wonCorners')].text
+            team['saves'] = side_stats[('td', side, 'saves')].text
+            team['possession'] = side_stats[('span', side, 'possessionPct')].text.replace('%','')
+            shots_summary = side_stats[('span', side, 'shotsSummary')].text
+            team['shots_on_target'] = int(SHOTS_ON_TARGET.findall(shots_summary)[0])
+            team['shots_off_target'] = int(SHOTS_TOTAL.findall(shots_summary)[0]) - team['shots_on_target']
+
+            if side == 'home':
+                athletes = soup.find('div',{'class':'content-tab','style':'display: block;'})
+            else:
+                athletes = soup.find('div',{'class':'content-tab','style':'display: none;'})
+            athletes = athletes.find_all('div', {'class':'accordion-item'})
+
+            starting_lineup = 0
+            prev_player = ''
+
+            for athlete in athletes:
+                player = {}
+
+                player_id = athlete.get('data-id')
+                player['id'] = 'P'+player_id
+                player['match_id'] = match_id
+                player['team_id'] = team_id
+                            
+                player_no = athlete.find('span',{'style':INLINE_BLOCK_STYLE})
+                player_name = athlete.find('a',{'data-player-uid':re.compile(f'.*'+player_id)}).text.strip()
+
+                if player['id'] not in player_details.keys():
+                    player_details[player['id']] = {}
+                    player_details[player['id']]['id'] = player['id']
+                    player_details[player['id']]['team_id'] = team_id
+                    player_details[player['id']]['player_link'] = athlete.find('a',{'data-player-uid':re.compile(f'.*'+player_id)}).get('href')
+                    player_details[player['id']]['player_name'] = player_name
+                    player_details[player['id']]['player_no'] = player_no
+                            
+                starting_lineup = starting_lineup + 0 if player_no is None else starting_lineup + 1
+                            
+
+                is_sub = True if player_no is None or starting_lineup >11 else False
+                player['is_sub'] = is_sub
+                player['played'] = True if starting_lineup <=11 else False
+                            
+                if is_sub:
+                    player['subbed_for'] = prev_player if is_sub else 'None'
+                    player['subbed_time'] = athlete.find('span',{'class':'icon-soccer-substitution-before'}).text if is_sub and starting_lineup <=11 else 'None'
+                            
+                player['player_no'] = athlete.find(string=re.compile('.* .*')).text.strip() if player_no is None else player_no.text
+                player_details[player['id']]['player_no'] = player['player_no']
+                for data_stat in athlete.find_all('span', {'data-stat':True}):
+                    player[data_stat.get('data-stat')] =  data_stat.text
+
+                prev_player = player_name
+
+                player_stats.append(player)
+        team_stats.append(team)
+    return {'match':match, 'team_stats':team_stats, 'team_details':team_details, 'player_details':player_details, 'player_stats':player_stats}
+
+
+def parse_commentary_file(commentary_file):
+    """
+    Parses a single commentary page into a plain record. Module level so it can be sent to worker processes.
+
+    Args:
+        commentary_file (str): Path of the commentary_<id>.html file, compressed or not.
+
+    Returns:
+        dict: The match id and its list of typed comment events (order, minute, added_time, type, description), see code/commentary.py.
+    """
+    page = read_page(commentary_file)
+    comments = parse_commentary(page)
+    if not comments and 'comment-' in page:
+        comments = _commentary_soup_events(page)
+    return {'id': COMMENTARY_FILE_ID.search(commentary_file).group(1), 'comments': comments}
+
+
+def _commentary_soup_events(page):
+    """
+    Reads the commentary rows with BeautifulSoup, for pages whose rows the patterns in code/commentary.py do not find,
+    e.g. when ESPN changes how the rows are written. Gives the same events as parse_commentary.
+    """
+    events = []
+    for row in BeautifulSoup(page, HTML_PARSER, parse_only=COMMENTARY_ROWS).find_all('tr'):
+        order = COMMENT_ORDER_DIGITS.search(row.get('data-id'))
+        event = {'order': int(order.group(1)) if order else len(events), 'minute': None, 'added_time': None,
+                 'type': EventType.from_espn(row.get('data-type')), 'description': ''}
+        for cell in row.find_all('td'):
+            classes = cell.get('class') or []
+            if 'time-stamp' in classes:
+                event['minute'], event['added_time'] = parse_timestamp(cell.text)
+            elif 'game-details' in classes:
+                event['description'] = cell.text.strip()
+        events.append(event)
+    return events
@@ -0,0 +1,188 @@
+import json
+
+from code.pageFetcher import atomic_write
+
+# Player stats record fields that are not data-stats to be summed
+PLAYER_FIELDS = {'id', 'match_id', 'team_id', 'is_sub', 'played', 'subbed_for', 'subbed_time', 'player_no'}
+
+# Team stats summed per team
+TEAM_STATS = ['fouls_committed', 'yellow_cards', 'red_cards', 'offsides', 'corners', 'saves', 'shots_on_target', 'shots_off_target']
+
+# Match status counted in results, form and standings, the only one parse_match_file reads team stats for
+FINISHED = 'FT'
+
+
+def _int(value):
+    """Whole number stats as ints, anything else (blank, None, 'None', '48%') as None."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    value = str(value).replace(',', '').strip()
+    return int(value) if value.lstrip('-').isdigit() else None
+
+
+class SeasonAggregates():
+    """
+    Per player, per team and per venue totals of the match records, built as each match is added, with id keyed lookups
+    of team and player names. Leaderboards, form and standings are answered from these without going back to the records.
+
+    Player totals count appearances, starts and substitute appearances and sum every whole number data-stat.
+    Team totals count results, goals and points from finished matches and sum the team stats in TEAM_STATS.
+    Venue totals count matches and the attendance of those with one.
+    """
+    def __init__(self):
+        self.players = {}
+        self.teams = {}
+        self.venues = {}
+        self.team_names = {}
+        self.player_names = {}
+        self.match_ids = set()
+
+    def add_match(self, result):
+        """
+        Adds one match, as returned by parse_match_file. A match already added is skipped.
+
+        Returns:
+            bool: Whether the match was added.
+        """
+        match = result['match']
+        if not match or match['id'] in self.match_ids:
+            return False
+        self.match_ids.add(match['id'])
+
+        for record in result['player_stats']:
+            player = self.players.setdefault(record['id'], {'team_id': record.get('team_id'), 'apps': 0, 'starts': 0, 'sub_apps': 0})
+            player['team_id'] = record.get('team_id')
+            if record.get('played'):
+                player['apps'] += 1
+                player['sub_apps' if record.get('is_sub') else 'starts'] += 1
+            for stat, value in record.items():
+                value = _int(value) if stat not in PLAYER_FIELDS else None
+                if value is not None:
+                    player[stat] = player.get(stat, 0) + value
+
+        home_score, away_score = _int(match.get('home_score')), _int(match.get('away_score'))
+        finished = match.get('status') == FINISHED and home_score is not None and away_score is not None
+        for record in result['team_stats']:
+            # Matches that have not finished have an empty record per side
+            if not record:
+                continue
+            team = self.teams.setdefault(record['id'], dict({'played': 0, 'won': 0, 'drawn': 0, 'lost': 0, 'goals_for': 0,
+                                                             'goals_against': 0, 'points': 0, 'results': []}, **{stat: 0 for stat in TEAM_STATS}))
+            for stat in TEAM_STATS:
+                team[stat] += _int(record.get(stat)) or 0
+            if finished:
+                home = record['side'] == 'home'
+                goals_for, goals_against = (home_score, away_score) if home else (away_score, home_score)
+                outcome = 'W' if goals_for > goals_against else 'D' if goals_for == goals_against else 'L'
+                team['played'] += 1
+                team[{'W': 'won', 'D': 'drawn', 'L': 'lost'}[outcome]] += 1
+                team['goals_for'] += goals_for
+                team['goals_against'] += goals_against
+                team['points'] += {'W': 3, 'D': 1, 'L': 0}[outcome]
+                team['results'].append({'match_id': match['id'], 'date_time': match.get('date_time'), 'side': record['side'],
+                                        'opponent_id': match.get('away_side_id') if home else match.get('home_side_id'),
+                                        'goals_for': goals_for, 'goals_against': goals_against, 'result': outcome})
+
+        if match.get('venue'):
+            venue = self.venues.setdefault(match['venue'], {'home_side_id': match.get('home_side_id'), 'matches': 0,
+                                                            'attendance_total': 0, 'attendance_matches': 0})
+            venue['matches'] += 1
+            attendance = _int(match.get('attendance'))
+            if attendance is not None:
+                venue['attendance_total'] += attendance
+                venue['attendance_matches'] += 1
+        return True
+
+    def add_details(self, team_details, player_details):
+        """Adds the team and player names used to label query results, from the team_details and player_details datasets."""
+        self.team_names.update({team_id: team.get('long_name') for team_id, team in team_details.items()})
+        self.player_names.update({player_id: player.get('player_name') for player_id, player in player_details.items()})
+
+    def top_players(self, stat, n=5, team_id=None):
+        """
+        The n players with the highest total of stat, e.g. top_players('totalGoals') or top_players('yellowCards', team_id='T359').
+
+        Returns:
+            list: Dictionaries of player_id, player_name, team_id, team and the stat, highest first.
+        """
+        players = ((player_id, player) for player_id, player in self.players.items()
+                   if player.get(stat) and (team_id is None or player['team_id'] == team_id))
+        ranked = sorted(players, key=lambda item: item[1][stat], reverse=True)[:n]
+        return [{'player_id': player_id, 'player_name': self.player_names.get(player_id), 'team_id': player['team_id'],
+                 'team': self.team_names.get(player['team_id']), stat: player[stat]} for player_id, player in ranked]
+
+    def top_teams(self, stat, n=5):
+        """
+        The n teams with the highest total of stat, a team stat (e.g. 'yellow_cards'), a result count (e.g. 'points'),
+        or a player data-stat summed over the team's players (e.g. 'yellowCards').
+
+        Returns:
+            list: Dictionaries of team_id, team and the stat, highest first.
+        """
+        if stat in TEAM_STATS or stat in ('played', 'won', 'drawn', 'lost', 'goals_for', 'goals_against', 'points'):
+            totals = {team_id: team[stat] for team_id, team in self.teams.items()}
+        else:
+            totals = {}
+            for player in self.players.values():
+                if player.get(stat):
+                    totals[player['team_id']] = totals.get(player['team_id'], 0) + player[stat]
+        ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [{'team_id': team_id, 'team': self.team_names.get(team_id), stat: total} for team_id, total in ranked]
+
+    def player_totals(self, player_id):
+        """Appearances, starts, substitute appearances and every summed data-stat of a player, None when not found."""
+        player = self.players.get(player_id)
+        if player is None:
+            return None
+        return dict(player, player_id=player_id, player_name=self.player_names.get(player_id), team=self.team_names.get(player['team_id']))
+
+    def team_form(self, team_id, last=5):
+        """
+        The latest results of a team, most recent first.
+
+        Returns:
+            dict: team_id, team, form (e.g. 'WWDLW', most recent first) and the results (match_id, date_time, side,
+                opponent_id, opponent, goals_for, goals_against, result).
+        """
+        team = self.teams.get(team_id, {'results': []})
+        results = sorted(team['results'], key=lambda result: result['date_time'] or '', reverse=True)[:last]
+        results = [dict(result, opponent=self.team_names.get(result['opponent_id'])) for result in results]
+        return {'team_id': team_id, 'team': self.team_names.get(team_id), 'form': ''.join(result['result'] for result in results),
+                'results': results}
+
+    def standings(self):
+        """The league table: points, then goal difference, then goals scored."""
+        rows = [{'team_id': team_id, 'team': self.team_names.get(team_id), 'played': team['played'], 'won': team['won'],
+                 'drawn': team['drawn'], 'lost': team['lost'], 'goals_for': team['goals_for'], 'goals_against': team['goals_against'],
+                 'goal_difference': team['goals_for'] - team['goals_against'], 'points': team['points']}
+                for team_id, team in self.teams.items()]
+        return sorted(rows, key=lambda row: (row['points'], row['goal_difference'], row['goals_for']), reverse=True)
+
+    def venue_attendance(self, n=None):
+        """
+        Venues by average attendance, highest first, leaving out venues without an attendance.
+
+        Returns:
+            list: Dictionaries of venue, home_side_id, home_team, matches and attendance (the average, rounded down).
+        """
+        rows = [{'venue': name, 'home_side_id': venue['home_side_id'], 'home_team': self.team_names.get(venue['home_side_id']),
+                 'matches': venue['matches'], 'attendance': venue['attendance_total'] // venue['attendance_matches']}
+                for name, venue in self.venues.items() if venue['attendance_matches']]
+        return sorted(rows, key=lambda row: row['attendance'], reverse=True)[:n]
+
+    def save(self, path):
+        data = {'players': self.players, 'teams': self.teams, 'venues': self.venues, 'team_names': self.team_names,
+                'player_names': self.player_names, 'match_ids': sorted(self.match_ids)}
+        atomic_write(path, json.dumps(data))
+
+    @classmethod
+    def load(cls, path):
+        aggregates = cls()
+        with open(path, 'r') as f:
+            data = json.load(f)
+        for name in ('players', 'teams', 'venues', 'team_names', 'player_names'):
+            setattr(aggregates, name, data[name])
+        aggregates.match_ids = set(data['match_ids'])
+        return aggregates
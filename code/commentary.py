@@ -0,0 +1,120 @@
+import re, html
+from enum import Enum
+
+# Commentary rows, read straight from the page text. Cells are found by class within each row.
+COMMENT_ROW = re.compile(r'<tr\b([^>]*\bdata-id="comment-[^"]*"[^>]*)>(.*?)</tr>', re.S)
+COMMENT_ORDER = re.compile(r'\bdata-id="comment-[^"]*?(\d+)"')
+COMMENT_TYPE = re.compile(r'\bdata-type="([^"]*)"')
+TIME_STAMP_CELL = re.compile(r'<td\b[^>]*\bclass="[^"]*\btime-stamp\b[^"]*"[^>]*>(.*?)</td>', re.S)
+DETAILS_CELL = re.compile(r'<td\b[^>]*\bclass="[^"]*\bgame-details\b[^"]*"[^>]*>(.*?)</td>', re.S)
+TAG = re.compile(r'<[^>]+>')
+
+# Minute and added time of a timestamp such as 12', 45'+2' or 90+3, '-' for lines before kick off
+TIMESTAMP = re.compile(r"(\d+)'?\s*(?:\+\s*(\d+))?")
+
+
+class EventType(str, Enum):
+    """
+    Commentary event types. ESPN's data-type values are grouped into these, e.g. goal---header and goal---free-kick are both GOAL.
+    Members are strings, so events stay plain JSON and compare equal to the values read back from the outputs.
+
+    Every goal scored is a GOAL, penalties included (goal---penalty, penalty---scored). Penalties saved or missed are
+    PENALTY_SAVED and PENALTY_MISSED, other penalty events (won, conceded) PENALTY. A second yellow card is a RED_CARD,
+    as the player is sent off.
+    """
+    GOAL = 'goal'
+    OWN_GOAL = 'own-goal'
+    PENALTY = 'penalty'
+    PENALTY_SAVED = 'penalty-saved'
+    PENALTY_MISSED = 'penalty-missed'
+    YELLOW_CARD = 'yellow-card'
+    RED_CARD = 'red-card'
+    SUBSTITUTION = 'substitution'
+    SHOT_SAVED = 'attempt-saved'
+    SHOT_MISSED = 'attempt-missed'
+    SHOT_BLOCKED = 'attempt-blocked'
+    SHOT_WOODWORK = 'attempt-woodwork'
+    FOUL = 'foul'
+    FREE_KICK = 'free-kick'
+    HANDBALL = 'handball'
+    CORNER = 'corner'
+    OFFSIDE = 'offside'
+    VAR = 'var'
+    DELAY = 'delay'
+    PERIOD = 'period'
+    OTHER = 'other'
+
+    def __str__(self):
+        return self.value
+
+    @classmethod
+    def from_espn(cls, data_type):
+        """Maps an ESPN data-type to its event type, OTHER when it is blank or not recognised."""
+        data_type = (data_type or '').lower()
+        event_type = _ESPN_TYPES.get(data_type)
+        if event_type is None:
+            event_type = next((event_type for keywords, event_type in _KEYWORD_TYPES
+                               if all(keyword in data_type for keyword in keywords)), cls.OTHER)
+            _ESPN_TYPES[data_type] = event_type
+        return event_type
+
+
+# Keywords looked for in ESPN data-types, in order, the first entry whose keywords are all found decides the type.
+# VAR reviews come first (var---goal-disallowed is not a goal), then penalty outcomes and second yellows before the
+# goal, penalty and yellow keywords they also contain.
+_KEYWORD_TYPES = [(('var',), EventType.VAR), (('own-goal',), EventType.OWN_GOAL),
+                  (('penalty', 'saved'), EventType.PENALTY_SAVED), (('penalty', 'miss'), EventType.PENALTY_MISSED),
+                  (('penalty', 'scored'), EventType.GOAL), (('goal',), EventType.GOAL), (('penalty',), EventType.PENALTY),
+                  (('yellow', 'red'), EventType.RED_CARD), (('second-yellow',), EventType.RED_CARD),
+                  (('red-card',), EventType.RED_CARD), (('yellow',), EventType.YELLOW_CARD),
+                  (('substitution',), EventType.SUBSTITUTION), (('saved',), EventType.SHOT_SAVED),
+                  (('missed',), EventType.SHOT_MISSED), (('blocked',), EventType.SHOT_BLOCKED),
+                  (('post',), EventType.SHOT_WOODWORK), (('bar',), EventType.SHOT_WOODWORK), (('woodwork',), EventType.SHOT_WOODWORK),
+                  (('hand',), EventType.HANDBALL), (('foul',), EventType.FOUL), (('free-kick',), EventType.FREE_KICK),
+                  (('corner',), EventType.CORNER), (('offside',), EventType.OFFSIDE),
+                  (('delay',), EventType.DELAY), (('half',), EventType.PERIOD), (('time',), EventType.PERIOD),
+                  (('kickoff',), EventType.PERIOD)]
+
+# Event type of every data-type seen so far, seeded with the exact values
+_ESPN_TYPES = {event_type.value: event_type for event_type in EventType}
+
+
+def parse_timestamp(text):
+    """
+    Returns:
+        tuple: The minute and the added time, e.g. (90, 3) for 90'+3', (12, 0) for 12', (None, None) when there is no time.
+    """
+    match = TIMESTAMP.search(text)
+    if match is None:
+        return None, None
+    return int(match.group(1)), int(match.group(2) or 0)
+
+
+def _cell_text(cell):
+    return html.unescape(TAG.sub('', cell)).strip()
+
+
+def parse_commentary(page):
+    """
+    Reads the commentary rows of a page in one pass over its text.
+
+    Args:
+        page (str): The commentary page HTML.
+
+    Returns:
+        list: An event per row, in page order: order (int), minute and added_time (int, None when the row has no time),
+            type (EventType) and description.
+    """
+    events = []
+    for attributes, row in COMMENT_ROW.findall(page):
+        order = COMMENT_ORDER.search(attributes)
+        data_type = COMMENT_TYPE.search(attributes)
+        time_stamp = TIME_STAMP_CELL.search(row)
+        details = DETAILS_CELL.search(row)
+        minute, added_time = parse_timestamp(_cell_text(time_stamp.group(1))) if time_stamp else (None, None)
+        events.append({'order': int(order.group(1)) if order else len(events),
+                       'minute': minute,
+                       'added_time': added_time,
+                       'type': EventType.from_espn(data_type.group(1) if data_type else None),
+                       'description': _cell_text(details.group(1)) if details else ''})
+    return events
@@ -0,0 +1,64 @@
+import os, json
+
+# Datasets written by get_match_data and get_commentary_data
+DATASETS = ['matches', 'team_details', 'team_stats', 'player_details', 'player_stats', 'commentary']
+
+# Datasets held in memory as dictionaries keyed by id, rather than lists
+DETAIL_DATASETS = {'team_details', 'player_details'}
+
+
+class NdjsonWriter():
+    """
+    Writes records as newline delimited JSON, one record per line, to <folder><name>.ndjson for each dataset name.
+
+    Records are written to a temporary file as they are produced, the finished files replace the previous outputs
+    only when the writer is closed without error, so a failed run leaves the last good outputs in place.
+    """
+    def __init__(self, folder, names):
+        self.paths = {name: f'{folder}{name}.ndjson' for name in names}
+        self.files = {name: open(f'{path}.tmp', 'w') for name, path in self.paths.items()}
+
+    def write(self, name, records):
+        f = self.files[name]
+        for record in records:
+            f.write(json.dumps(record))
+            f.write('\n')
+
+    def close(self):
+        for name, f in self.files.items():
+            f.close()
+            os.replace(f'{self.paths[name]}.tmp', self.paths[name])
+
+    def abort(self):
+        for name, f in self.files.items():
+            f.close()
+            os.remove(f'{self.paths[name]}.tmp')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def iter_dataset(folder, name):
+    """
+    Yields the records of a dataset one at a time from <folder><name>.ndjson.
+    Falls back to the whole file <folder><name>.json written by earlier versions.
+    """
+    path = f'{folder}{name}.ndjson'
+    if os.path.isfile(path):
+        with open(path, 'r') as f:
+            for line in f:
+                yield json.loads(line)
+    else:
+        with open(f'{folder}{name}.json', 'r') as f:
+            data = json.load(f)
+        yield from data.values() if name in DETAIL_DATASETS else data
+
+
+def dataset_exists(folder, name):
+    return os.path.isfile(f'{folder}{name}.ndjson')
@@ -0,0 +1,94 @@
+import json, logging, time
+from datetime import datetime, timedelta
+
+import pytz
+
+from code.pageFetcher import atomic_write
+
+
+class FixtureCalendar():
+    """
+    Which dates of a season have fixtures, kept in a JSON file so later runs only request the fixture pages of matchdays.
+
+    Dates are learnt from the fixture pages themselves (the number of games linked from each page) and, when a schedule url
+    is configured, from the league's schedule. A date is fetched when it is a known matchday, when nothing is known about
+    it yet, or when it falls in the look-ahead window around today, where games are still being added and rescheduled.
+    Dates already checked and found empty, or missing from the schedule, are skipped outside the window.
+
+    Parameters
+    ----------
+    path : str
+        The calendar file, loaded when it exists.
+    """
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        self.games = data.get('games', {})
+        self.schedule = set(data.get('schedule', []))
+        self.schedule_fetched_at = data.get('schedule_fetched_at')
+
+    def record(self, strdate, games):
+        """Records the number of games on the fixture page of a date (YYYYMMDD)."""
+        self.games[strdate] = games
+
+    def is_matchday(self, strdate):
+        return self.games.get(strdate, 0) > 0 or strdate in self.schedule
+
+    def select(self, dates, lookahead_days, today=None):
+        """
+        Args:
+            dates (list): The season's dates, as built by FootballDataScraper._build_season_date_list.
+            lookahead_days (int): Days either side of today that are always fetched.
+            today (date, optional): Default is today.
+
+        Returns:
+            list: The dates whose fixture pages should be fetched, in season order.
+        """
+        today = today or datetime.now().date()
+        window = ((today - timedelta(days=lookahead_days)).strftime('%Y%m%d'), (today + timedelta(days=lookahead_days)).strftime('%Y%m%d'))
+        selected = []
+        for d in dates:
+            strdate = d['strdate']
+            if window[0] <= strdate <= window[1] or self.is_matchday(strdate):
+                selected.append(d)
+            elif strdate not in self.games and not self.schedule:
+                selected.append(d)
+        return selected
+
+    def schedule_is_fresh(self, ttl):
+        return self.schedule_fetched_at is not None and time.time() - self.schedule_fetched_at < ttl
+
+    def load_schedule(self, fetcher, url):
+        """
+        Reads the matchdays from the league's schedule, an ESPN scoreboard response covering the season.
+        The dates of its events, and of its calendar when it has one, are taken in London time like the fixture pages.
+        A schedule that cannot be fetched or read is logged and left out, the fixture pages alone are used then.
+
+        Returns:
+            bool: Whether the schedule was read.
+        """
+        try:
+            data = fetcher.get(url).json()
+        except Exception as err:
+            logging.warning(f'Could not read the schedule {url}, using the fixture pages alone: {err}')
+            return False
+        stamps = [event.get('date') for event in data.get('events', [])]
+        for league in data.get('leagues', []):
+            stamps.extend(day if isinstance(day, str) else day.get('startDate') for day in league.get('calendar', []))
+        london = pytz.timezone('Europe/London')
+        schedule = set()
+        for stamp in stamps:
+            if stamp:
+                schedule.add(datetime.fromisoformat(stamp.replace('Z', '+00:00')).astimezone(london).strftime('%Y%m%d'))
+        self.schedule = schedule
+        self.schedule_fetched_at = time.time()
+        logging.info(f'Schedule lists {len(schedule)} matchdays')
+        return True
+
+    def save(self):
+        atomic_write(self.path, json.dumps({'games': self.games, 'schedule': sorted(self.schedule),
+                                            'schedule_fetched_at': self.schedule_fetched_at}))
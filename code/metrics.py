@@ -0,0 +1,142 @@
+import os, json, logging, time, statistics, importlib.util, cProfile
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from code.pageFetcher import atomic_write
+
+# pyinstrument is optional, it is only needed when profiler = pyinstrument
+if importlib.util.find_spec('pyinstrument') is not None:
+    from pyinstrument import Profiler
+else:
+    Profiler = None
+
+PROFILERS = ['cprofile', 'pyinstrument']
+
+LOG_FORMAT = '%(name)s - %(levelname)s - %(asctime)s - %(message)s'
+
+
+def setup_logging(log_fld, level='INFO'):
+    """
+    Logs to <log_fld>fbs.log, appending so earlier runs are kept. Does nothing if logging is already configured,
+    e.g. by an application importing the scraper.
+    """
+    os.makedirs(log_fld, exist_ok=True)
+    logging.basicConfig(filename=f'{log_fld}fbs.log', filemode='a', format=LOG_FORMAT, level=getattr(logging, level.upper()))
+
+
+class RunMetrics():
+    """
+    Timings and counters for one run of the scraper.
+
+    Stages are the FootballDataScraper methods (get_match_links, extract_game_pages, ...), timed as a whole.
+    Items are the steps repeated for every page or file within a stage (fetch, parse, serialize, write),
+    each duration kept so the summary can report percentiles. Counters are totals such as bytes_downloaded or pages_parsed.
+    """
+    def __init__(self, label=None):
+        self.run_id = datetime.now().strftime('%Y%m%dT%H%M%S')
+        if label:
+            self.run_id = f'{label}_{self.run_id}'
+        self.started = datetime.now()
+        self.stages = {}
+        self.items = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0})
+            stage['calls'] += 1
+            stage['seconds'] += time.perf_counter() - start
+
+    @contextmanager
+    def item(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_item(name, time.perf_counter() - start)
+
+    def add_item(self, name, seconds):
+        self.items.setdefault(name, []).append(seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        """
+        Returns:
+            dict: The run id and start time, elapsed seconds, seconds and calls per stage, count, total, mean,
+                p50, p95 and max seconds per item type, and the counters.
+        """
+        items = {}
+        for name, durations in self.items.items():
+            ordered = sorted(durations)
+            items[name] = {'count': len(ordered), 'seconds': round(sum(ordered), 6), 'mean': round(statistics.fmean(ordered), 6),
+                           'p50': round(ordered[len(ordered) // 2], 6), 'p95': round(ordered[int(len(ordered) * 0.95)], 6),
+                           'max': round(ordered[-1], 6)}
+        return {'run_id': self.run_id, 'started': self.started.isoformat(timespec='seconds'),
+                'elapsed': round((datetime.now() - self.started).total_seconds(), 3),
+                'stages': {name: {'calls': stage['calls'], 'seconds': round(stage['seconds'], 6)} for name, stage in self.stages.items()},
+                'items': items, 'counters': dict(self.counters)}
+
+    def write(self, folder):
+        """Writes the summary to <folder>metrics_<run_id>.json and returns its path."""
+        os.makedirs(folder, exist_ok=True)
+        path = f'{folder}metrics_{self.run_id}.json'
+        atomic_write(path, json.dumps(self.summary(), indent=2))
+        return path
+
+
+@contextmanager
+def profiled(profiler, path):
+    """
+    Profiles the enclosed code, writing <path>.prof (cprofile, for pstats or snakeviz) or <path>.html (pyinstrument).
+    """
+    if profiler == 'cprofile':
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(f'{path}.prof')
+            logging.info(f'Profile written to {path}.prof')
+    elif profiler == 'pyinstrument':
+        if Profiler is None:
+            raise ImportError('pyinstrument is required for profiler = pyinstrument, install it with pip install pyinstrument')
+        profile = Profiler()
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            with open(f'{path}.html', 'w') as f:
+                f.write(profile.output_html())
+            logging.info(f'Profile written to {path}.html')
+    else:
+        raise ValueError(f'Unknown profiler {profiler}, expected one of {", ".join(PROFILERS)}')
+
+
+def timed_stage(func):
+    """
+    Decorates a FootballDataScraper stage: logs its start and end with the duration, adds the duration to the run metrics,
+    and profiles it when the scraper was created with a profiler and the stage is one of its profile_stages (all when empty).
+    """
+    @wraps(func)
+    def stage(self, *args, **kwargs):
+        name = func.__name__
+        logging.info(f'START: {name}')
+        start = time.perf_counter()
+        with self.metrics.stage(name):
+            if self.profiler and (not self.profile_stages or name in self.profile_stages):
+                with profiled(self.profiler, f'{self.log_fld}profile_{self.metrics.run_id}_{name}'):
+                    result = func(self, *args, **kwargs)
+            else:
+                result = func(self, *args, **kwargs)
+        logging.info(f'END: {name} in {time.perf_counter() - start:.3f}s')
+        return result
+    return stage
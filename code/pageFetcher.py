@@ -0,0 +1,177 @@
+import os, threading, time, logging, json
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class RateLimiter():
+    """
+    Spaces out requests to the same host so that no more than `rate` requests per second are started.
+    A rate of 0 disables the limit.
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / float(rate) if float(rate) > 0 else 0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class PageFetcher():
+    """
+    Downloads pages over a shared keep-alive connection pool using a bounded pool of worker threads.
+
+    Parameters
+    ----------
+    max_workers : int
+        Number of pages downloaded concurrently.
+    requests_per_second : float
+        Maximum number of requests started per second against a single host (0 for no limit).
+    max_retries : int
+        Number of retries for connection errors and retryable status codes (429 and 5xx).
+    backoff_factor : float
+        Exponential backoff between retries, in seconds.
+    timeout : float
+        Connect/read timeout for each request, in seconds.
+    """
+    def __init__(self, max_workers=8, requests_per_second=4, max_retries=3, backoff_factor=0.5, timeout=20):
+        self.max_workers = int(max_workers)
+        self.timeout = float(timeout)
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self._executor = None
+
+        retry = Retry(total=int(max_retries), backoff_factor=float(backoff_factor),
+                      status_forcelist=[429, 500, 502, 503, 504], allowed_methods=['GET'])
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a PageFetcher from the download settings in footballscraper.config."""
+        return cls(max_workers=config.max_workers,
+                   requests_per_second=config.requests_per_second,
+                   max_retries=config.max_retries,
+                   backoff_factor=config.backoff_factor,
+                   timeout=config.request_timeout)
+
+    def get(self, url, headers=None):
+        """
+        Fetches a single url through the pooled session, respecting the per-host rate limit.
+        A 304 Not Modified answer to a conditional request is returned rather than raised.
+        """
+        self.rate_limiter.wait(urlparse(url).netloc)
+        response = self.session.get(url, timeout=self.timeout, headers=headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    def fetch_all(self, urls, headers=None):
+        """
+        Fetches every url concurrently.
+
+        Parameters
+        ----------
+        urls : iterable
+            The urls to fetch.
+        headers : dict, optional
+            Extra request headers per url, e.g. the conditional headers from a ResponseCache.
+
+        Yields
+        ------
+        tuple
+            (url, response, error) in completion order. `response` is None when the url failed after
+            all retries, in which case `error` holds the exception.
+        """
+        # Shut down without waiting when the consumer stops early (an error, Ctrl-C), so the queued pages are cancelled
+        # rather than downloaded and thrown away. Only the requests already running are left to finish.
+        executor = self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            headers = headers or {}
+            futures = {executor.submit(self.get, url, headers.get(url)): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    yield url, future.result(), None
+                except requests.RequestException as err:
+                    logging.error(f'Failed to fetch {url}: {err}')
+                    yield url, None, err
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        """Cancels the pages still queued by fetch_all, in case its generator was not closed, and closes the session."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.session.close()
+
+
+class ResponseCache():
+    """
+    Keeps the ETag, Last-Modified, fetch time and time to live of every downloaded url in a JSON file, so later runs
+    can skip pages that are still fresh and send conditional requests for the rest.
+    The page bodies themselves are not kept here, they stay in the files the pages were saved to.
+    """
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        try:
+            with open(cache_file, 'r') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def is_fresh(self, url):
+        """True when url was fetched less than its time to live ago."""
+        entry = self.entries.get(url)
+        return entry is not None and time.time() - entry['fetched_at'] < entry['ttl']
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for url, empty when nothing is known about it."""
+        entry = self.entries.get(url, {})
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def update(self, url, ttl, response=None, fetched_at=None):
+        """
+        Records a fetch of url. The validators are taken from response on a 200 and kept as they are on a 304.
+        fetched_at defaults to now, it can be given to seed the cache with pages downloaded before it existed.
+        """
+        entry = self.entries.setdefault(url, {})
+        if response is not None and response.status_code != 304:
+            entry['etag'] = response.headers.get('ETag')
+            entry['last_modified'] = response.headers.get('Last-Modified')
+        entry['fetched_at'] = time.time() if fetched_at is None else fetched_at
+        entry['ttl'] = float(ttl)
+
+    def save(self):
+        atomic_write(self.cache_file, json.dumps(self.entries))
+
+
+def atomic_write(filename, data, binary=False):
+    """
+    Writes data to filename via a temporary file in the same folder, so an interrupted run never
+    leaves a half written page behind. data is bytes when binary is True, text otherwise.
+    """
+    tmp_filename = f'{filename}.tmp'
+    with open(tmp_filename, 'wb' if binary else 'w') as f:
+        f.write(data)
+    os.replace(tmp_filename, filename)
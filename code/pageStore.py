@@ -0,0 +1,98 @@
+import os, glob, gzip, logging, importlib.util
+
+from code.pageFetcher import atomic_write
+
+# zstandard is optional, gzip from the standard library is used when it is not installed
+if importlib.util.find_spec('zstandard') is not None:
+    import zstandard
+else:
+    zstandard = None
+
+SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+class PageStore():
+    """
+    Saves HTML pages into a folder as <name>.html, compressed with gzip (<name>.html.gz) or zstd (<name>.html.zst).
+    Pages are found and read back whatever format they were saved in, so changing the compression setting
+    does not orphan pages downloaded before.
+
+    Parameters
+    ----------
+    folder : str
+        Folder the pages are saved in, with a trailing slash like the folders in footballscraper.config.
+    compression : str
+        One of 'none', 'gzip' or 'zstd'.
+    """
+    def __init__(self, folder, compression='gzip'):
+        if compression not in SUFFIXES:
+            raise ValueError(f'Unknown page compression {compression}, expected one of {", ".join(SUFFIXES)}')
+        if compression == 'zstd' and zstandard is None:
+            logging.warning('zstandard is not installed, pages are stored with gzip instead')
+            compression = 'gzip'
+        self.folder = folder
+        self.compression = compression
+
+    @classmethod
+    def from_config(cls, config, folder):
+        return cls(folder, config.page_compression)
+
+    def path(self, name):
+        """Path a page is written to with the current compression."""
+        return f'{self.folder}{name}.html{SUFFIXES[self.compression]}'
+
+    def find(self, name):
+        """Path of the saved copy of a page in any format, preferring the current one. None when it is not saved."""
+        paths = [self.path(name)] + [f'{self.folder}{name}.html{suffix}' for suffix in SUFFIXES.values()]
+        return next((path for path in paths if os.path.isfile(path)), None)
+
+    def exists(self, name):
+        return self.find(name) is not None
+
+    def read(self, name):
+        return read_page(self.find(name))
+
+    def write(self, name, text):
+        """Writes a page atomically with the current compression and removes copies saved in other formats."""
+        path = self.path(name)
+        atomic_write(path, compress(text.encode('utf-8'), self.compression), binary=True)
+        for suffix in SUFFIXES.values():
+            other = f'{self.folder}{name}.html{suffix}'
+            if other != path and os.path.isfile(other):
+                os.remove(other)
+
+    def list(self, prefix):
+        """Paths of every saved page whose name starts with prefix, e.g. 'match_', in glob order."""
+        suffixes = tuple(f'.html{suffix}' for suffix in SUFFIXES.values())
+        return [path for path in glob.glob(f'{self.folder}{prefix}*.html*') if path.endswith(suffixes)]
+
+    def migrate(self):
+        """Rewrites every page saved in another format with the current compression."""
+        current = f'.html{SUFFIXES[self.compression]}'
+        for path in self.list(''):
+            if not path.endswith(current):
+                name = os.path.basename(path)
+                self.write(name[:name.index('.html')], read_page(path))
+
+
+def compress(data, compression):
+    if compression == 'gzip':
+        # A fixed mtime keeps the bytes, and so the content hash, the same for the same page
+        return gzip.compress(data, mtime=0)
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def read_page(path):
+    """
+    Reads a saved page as text, decompressing it according to its suffix.
+    Module level so it can be used by the parse functions in worker processes.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.gz'):
+        data = gzip.decompress(data)
+    elif path.endswith('.zst'):
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return data.decode('utf-8')
@@ -0,0 +1,195 @@
+"""
+Runs the whole scrape, from fixture pages to the output datasets, as one resumable job.
+
+    python -m code.pipeline --workers 4
+
+Progress is checkpointed to pipeline_checkpoint.json in the scraper's data folder: the stages completed, the fixture
+dates done, every page downloaded in this run, the pages that failed and the retry queue. Running the same command again
+after a crash or a network drop resumes where the last run stopped, without requesting the pages it had already fetched.
+"""
+import os, json, logging, time, argparse
+from datetime import datetime
+
+from code.FootballScraper import FootballDataScraper
+from code.pageFetcher import atomic_write
+
+STAGES = ['links', 'pages', 'matches', 'commentary', 'export']
+
+# Minimum seconds between checkpoint saves while pages are being fetched
+SAVE_INTERVAL = 5
+
+
+class Checkpoint():
+    """
+    The durable state of a pipeline run, saved as JSON.
+
+    Parameters
+    ----------
+    path : str
+        Checkpoint file. It is loaded when it exists, so the run it describes is resumed.
+    heartbeat : function, optional
+        Called each time the checkpoint is saved, e.g. ShardLock.refresh to show the shard is still being worked on.
+    """
+    def __init__(self, path, heartbeat=None):
+        self.path = path
+        self.heartbeat = heartbeat
+        self.saved_at = 0
+        try:
+            with open(path, 'r') as f:
+                self.state = json.load(f)
+            self.resumed = True
+        except FileNotFoundError:
+            self.state = {'run_id': datetime.now().strftime('%Y%m%dT%H%M%S'), 'started': datetime.now().isoformat(timespec='seconds'),
+                          'stages': {}, 'completed_dates': [], 'last_completed_date': None, 'downloaded': {}, 'failed': {}, 'retry_queue': []}
+            self.resumed = False
+
+    def is_done(self, stage):
+        return self.state['stages'].get(stage) == 'done'
+
+    def complete(self, stage):
+        self.state['stages'][stage] = 'done'
+        self.save(force=True)
+
+    @property
+    def completed_pages(self):
+        """Names of the pages fetched in this run, fixture dates and game pages."""
+        return set(self.state['downloaded'].values())
+
+    @property
+    def retry_queue(self):
+        return self.state['retry_queue']
+
+    def page(self, url, name, outcome):
+        """Records the outcome of a page, see FootballDataScraper._fetch_pages."""
+        failed = self.state['failed']
+        if outcome == 'failed':
+            failed.setdefault(url, {'name': name, 'attempts': 0})['attempts'] += 1
+            if url not in self.state['retry_queue']:
+                self.state['retry_queue'].append(url)
+        else:
+            self.state['downloaded'][url] = name
+            if url in failed:
+                del failed[url]
+                self.state['retry_queue'].remove(url)
+        self.save()
+
+    def fixture_page(self, url, date, outcome):
+        self.page(url, date, outcome)
+        if outcome != 'failed':
+            if date not in self.state['completed_dates']:
+                self.state['completed_dates'].append(date)
+            self.state['last_completed_date'] = max(date, self.state['last_completed_date'] or date)
+
+    def save(self, force=False):
+        if force or time.time() - self.saved_at >= SAVE_INTERVAL:
+            self.state['updated'] = datetime.now().isoformat(timespec='seconds')
+            atomic_write(self.path, json.dumps(self.state, indent=1))
+            self.saved_at = time.time()
+            if self.heartbeat is not None:
+                self.heartbeat()
+
+    def finish(self):
+        """Keeps the finished run as pipeline_last_run.json next to the checkpoint, so the next run starts afresh."""
+        self.save(force=True)
+        os.replace(self.path, os.path.join(os.path.dirname(self.path), 'pipeline_last_run.json'))
+
+
+def _fetch_with_retries(fetch, checkpoint, retries, retry_wait):
+    """
+    Runs a fetching stage, then runs it again while pages are left in the retry queue, up to retries more times.
+    Pages already fetched in this run are skipped on every pass, so each retry only requests the failed pages.
+    """
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            logging.info(f'Retrying {len(checkpoint.retry_queue)} failed pages in {retry_wait}s, attempt {attempt} of {retries}')
+            time.sleep(retry_wait)
+        fetch(attempt)
+        checkpoint.save(force=True)
+        if not checkpoint.retry_queue:
+            return
+    logging.warning(f'{len(checkpoint.retry_queue)} pages still failing after {retries} retries, see {checkpoint.path}')
+    print(f'WARNING: {len(checkpoint.retry_queue)} pages could not be fetched, they are listed under failed in {checkpoint.path}')
+
+
+def run(fds, checkpoint, stages=STAGES, workers=1, refresh=False, retries=2, retry_wait=60):
+    """
+    Runs the pipeline stages in order, skipping those the checkpoint records as done.
+
+    Args:
+        fds (FootballDataScraper): The scraper the stages are run on.
+        checkpoint (Checkpoint): The run's checkpoint, updated as pages are fetched and stages complete.
+        stages (list, optional): Stages to run, any of links, pages, matches, commentary and export. Default is all.
+        workers (int, optional): Processes used to parse the pages. Default is 1.
+        refresh (bool, optional): Revalidate every page, not just those missing or past their time to live. Default is False.
+        retries (int, optional): Passes over the failed pages after each fetching stage. Default is 2.
+        retry_wait (float, optional): Seconds to wait before each retry pass. Default is 60.
+    """
+    if 'links' in stages and not checkpoint.is_done('links'):
+        _fetch_with_retries(lambda attempt: fds.get_match_links(from_file=False, refresh=refresh and attempt == 0,
+                                                                completed=checkpoint.completed_pages, on_page=checkpoint.fixture_page),
+                            checkpoint, retries, retry_wait)
+        checkpoint.complete('links')
+    elif fds.match_links is None and 'pages' in stages and not checkpoint.is_done('pages'):
+        fds.get_match_links(from_file=True)
+        if fds.match_links is None:
+            raise FileNotFoundError(f'No {fds.data_fld}match_links.csv for the pages stage, run the links stage first')
+
+    if 'pages' in stages and not checkpoint.is_done('pages'):
+        _fetch_with_retries(lambda attempt: fds.extract_game_pages(refresh=refresh and attempt == 0,
+                                                                   completed=checkpoint.completed_pages, on_page=checkpoint.page),
+                            checkpoint, retries, retry_wait)
+        checkpoint.complete('pages')
+
+    # Parsing is incremental through the output folder manifests, a resumed stage only parses the files it had not finished
+    if 'matches' in stages and not checkpoint.is_done('matches'):
+        fds.get_match_data(from_file=False, workers=workers)
+        checkpoint.complete('matches')
+
+    if 'commentary' in stages and not checkpoint.is_done('commentary'):
+        fds.get_commentary_data(from_file=False, workers=workers)
+        checkpoint.complete('commentary')
+
+    if 'export' in stages and not checkpoint.is_done('export'):
+        fds.export_tables()
+        checkpoint.complete('export')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scrape the season configured in footballscraper.config, resuming an interrupted run.')
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES, help='Stages to run, default is all.')
+    parser.add_argument('--workers', type=int, default=1, help='Processes used to parse the pages.')
+    parser.add_argument('--refresh', action='store_true', help='Revalidate every page, not just those missing or past their time to live.')
+    parser.add_argument('--retries', type=int, default=2, help='Passes over the failed pages after each fetching stage.')
+    parser.add_argument('--retry-wait', type=float, default=60, help='Seconds to wait before each retry pass.')
+    parser.add_argument('--restart', action='store_true', help='Discard the checkpoint of an unfinished run and start again.')
+    parser.add_argument('--league', help='League to scrape as its own shard, e.g. eng.1. Needs --season.')
+    parser.add_argument('--season', type=int, help='Year the season to scrape as its own shard starts in. Needs --league.')
+    parser.add_argument('--checkpoint', help='Checkpoint file, default is pipeline_checkpoint.json in the data folder.')
+    args = parser.parse_args(argv)
+    if (args.league is None) != (args.season is None):
+        parser.error('--league and --season go together')
+
+    fds = FootballDataScraper(args.league, args.season)
+    args.checkpoint = args.checkpoint or f'{fds.data_fld}pipeline_checkpoint.json'
+    if args.restart and os.path.isfile(args.checkpoint):
+        os.remove(args.checkpoint)
+    checkpoint = Checkpoint(args.checkpoint)
+    if checkpoint.resumed:
+        done = [stage for stage in STAGES if checkpoint.is_done(stage)]
+        print(f'Resuming run {checkpoint.state["run_id"]}, stages done: {", ".join(done) or "none"}, '
+              f'{len(checkpoint.state["downloaded"])} pages already fetched')
+        logging.info(f'Resuming pipeline run {checkpoint.state["run_id"]}')
+
+    try:
+        run(fds, checkpoint, args.stages, args.workers, args.refresh, args.retries, args.retry_wait)
+    except BaseException:
+        checkpoint.save(force=True)
+        print(f'\nStopped, run the same command again to resume from {args.checkpoint}')
+        raise
+    finally:
+        fds.write_metrics()
+    checkpoint.finish()
+
+
+if __name__ == '__main__':
+    main()
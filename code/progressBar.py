@@ -1,19 +1,94 @@
-from datetime import datetime
+import sys, json, time
 
-def progress_bar(progress, total, start_timestamp):
+def _duration(seconds):
+    """Seconds as h:mm:ss.ss."""
+    return f'{int(seconds // 3600)}:{int(seconds % 3600 // 60):02d}:{seconds % 60:05.2f}'
+
+
+class Progress():
+    """
+    Progress of a loop, redrawn at most once every interval seconds however often update is called, so it costs next to
+    nothing in tight loops. On a terminal it draws a bar along with items/sec and ETA. When stdout is not a
+    terminal (cron, containers, output piped to a file) it writes a JSON line per interval instead, e.g.
+    {"task": "get_match_data", "done": 500, "total": 1104, "percent": 45.29, "elapsed": 11.1, "rate": 45.0, "eta": 13.4}
+
+    Args:
+        total (int): Number of items.
+        task (str, optional): Name shown with the progress. Default is blank.
+        interval (float, optional): Minimum seconds between updates on a terminal. Default is 0.5.
+        mode (str, optional): 'bar', 'json', 'off', or 'auto' for bar on a terminal and json otherwise. Default is 'auto'.
+        json_interval (float, optional): Minimum seconds between JSON lines. Default is 30.
+        stream (file, optional): Where progress is written. Default is sys.stdout.
+
+    Example:
+        with Progress(len(files), 'parse') as progress:
+            for file in files:
+                ...
+                progress.update()
+        logging.info(progress.summary())
+    """
     BLOCK = '█'
     COLOUR_YELLOW = '\033[33m'
     COLOUR_GREEN = '\033[92m'
     COLOUR_CLEAR = '\033[0m'
 
-    percent = 100 * (progress /float(total))
-    bar = BLOCK * int(percent) + '-' * (100 - int(percent))
+    def __init__(self, total, task='', interval=0.5, mode='auto', json_interval=30, stream=None):
+        self.total = total
+        self.task = task
+        self.stream = stream or sys.stdout
+        if mode == 'auto':
+            mode = 'bar' if self.stream.isatty() else 'json'
+        self.mode = mode
+        self.interval = interval if mode == 'bar' else json_interval
+        self.done = 0
+        self.start = time.monotonic()
+        self.next_report = self.start + self.interval
+
+    def update(self, n=1):
+        self.done += n
+        now = time.monotonic()
+        if now >= self.next_report:
+            self.next_report = now + self.interval
+            self._report(now)
+
+    def _stats(self, now):
+        elapsed = now - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else None
+        return elapsed, rate, eta
+
+    def _report(self, now, final=False):
+        if self.mode == 'off':
+            return
+        elapsed, rate, eta = self._stats(now)
+        percent = 100 * self.done / self.total if self.total else 100.0
+        if self.mode == 'json':
+            self.stream.write(json.dumps({'task': self.task, 'done': self.done, 'total': self.total, 'percent': round(percent, 2),
+                                          'elapsed': round(elapsed, 1), 'rate': round(rate, 1),
+                                          'eta': None if eta is None else round(eta, 1)}) + '\n')
+            self.stream.flush()
+            return
+        bar = self.BLOCK * int(percent) + '-' * (100 - int(percent))
+        colour = self.COLOUR_GREEN if final else self.COLOUR_YELLOW
+        eta = '' if final or eta is None else f' | ETA {_duration(eta)[:-3]}'
+        self.stream.write(colour + f'\r {self.task} |{bar}|{percent:.2f}% | {self.done}/{self.total} | '
+                                   f'{_duration(elapsed)} | {rate:.1f} it/s{eta} ')
+        if final:
+            self.stream.write('\nJob Complete\n' + self.COLOUR_CLEAR)
+        self.stream.flush()
+
+    def close(self):
+        """Reports the final count, whatever the interval."""
+        self._report(time.monotonic(), final=True)
+
+    def summary(self):
+        """A line for the log, e.g. 'parse Job Complete 1104/1104 | 0:00:24.51 | 45.0 it/s'."""
+        elapsed, rate, eta = self._stats(time.monotonic())
+        return f'{self.task} Job Complete {self.done}/{self.total} | {_duration(elapsed)} | {rate:.1f} it/s'
 
-    time_taken = str((datetime.now() - start_timestamp))
-    time_taken = time_taken[:time_taken.find('.')+3]
+    def __enter__(self):
+        return self
 
-    print(COLOUR_YELLOW + f'\r |{bar}|{percent:.2f}% | {progress}/{total} | {time_taken} ', end='\r')
-    if progress == total:
-        print(COLOUR_GREEN + f'\r |{bar}|{percent:.2f}% | {progress}/{total} | {time_taken} ', end='\r')
-        print('\nJob Complete\n' + COLOUR_CLEAR, end='\r')
-    return f' Job Complete {progress}/{total} | {time_taken}'
\ No newline at end of file
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
@@ -0,0 +1,224 @@
+"""
+Scrapes several leagues and seasons, one (league, season) shard per worker process, then merges their outputs into one index.
+
+    python -m code.shards --leagues eng.1 eng.2 --seasons 2013-2022 --processes 4
+
+Each shard keeps its pages, checkpoint and outputs in its own folders (see FootballDataScraper) and is claimed with a lock
+file while it runs, so several machines sharing the data folder can work through the same list of shards without
+scraping one twice. The merged index of matches, teams and players is written to <output_fld>index/.
+"""
+import os, json, logging, socket, time, argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from code.FootballScraper import FootballDataScraper, config
+from code.datasets import NdjsonWriter, iter_dataset, dataset_exists
+from code.pipeline import Checkpoint, STAGES, run
+
+INDEX_FIELDS = ['id', 'date_time', 'status', 'home_side_id', 'away_side_id', 'home_score', 'away_score', 'venue']
+
+
+def parse_seasons(seasons):
+    """Seasons as written in footballscraper.config or on the command line, e.g. '2013-2022' or '2020,2022'."""
+    years = []
+    for part in seasons.replace(',', ' ').split():
+        if '-' in part:
+            first, last = part.split('-')
+            years.extend(range(int(first), int(last) + 1))
+        else:
+            years.append(int(part))
+    return years
+
+
+class ShardLock():
+    """
+    A lock file claiming a shard for one process. Creating the file is atomic, so of several processes or machines
+    trying to claim the same shard only one succeeds. The holder refreshes the file's mtime as it works, locks not
+    refreshed for shard_lock_timeout seconds are taken to be left by a process that died and are broken.
+
+    Parameters
+    ----------
+    path : str
+        The lock file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.acquired = False
+
+    def _is_stale(self, path):
+        return time.time() - os.path.getmtime(path) > float(config.shard_lock_timeout)
+
+    def _break_stale(self):
+        """
+        Moves a stale lock out of the way under a name of this process's own, so of several processes breaking the same
+        lock only one does, then checks it again in case it was refreshed before the move.
+        """
+        try:
+            if not self._is_stale(self.path):
+                return
+            broken = f'{self.path}.{socket.gethostname()}.{os.getpid()}.broken'
+            os.rename(self.path, broken)
+        except FileNotFoundError:
+            return
+        if self._is_stale(broken):
+            logging.warning(f'Breaking stale lock {self.path}')
+            os.remove(broken)
+            return
+        # Refreshed by its holder after all, put back unless another process has claimed the shard in the meantime
+        try:
+            os.link(broken, self.path)
+        except FileExistsError:
+            logging.warning(f'Lock {self.path} was refreshed while being broken and has been claimed again')
+        os.remove(broken)
+
+    def acquire(self):
+        if os.path.isfile(self.path):
+            self._break_stale()
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'host': socket.gethostname(), 'pid': os.getpid(), 'started': time.time()}, f)
+        self.acquired = True
+        return True
+
+    def refresh(self):
+        """Marks the lock as still held, see Checkpoint's heartbeat."""
+        if self.acquired:
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                logging.warning(f'Lock {self.path} was broken by another process')
+
+    def release(self):
+        if self.acquired:
+            os.remove(self.path)
+            self.acquired = False
+
+
+def run_shard(league, season, stages=STAGES, workers=1, refresh=False, retries=2, retry_wait=60, requests_per_second=None):
+    """
+    Runs the pipeline for one shard, resuming its checkpoint if it was interrupted.
+
+    Args:
+        requests_per_second (float, optional): This process's share of the per host rate limit, see run_shards.
+            Default is requests_per_second in footballscraper.config.
+
+    Returns:
+        str: 'done', 'locked' when another process holds the shard, or 'failed: <error>'.
+    """
+    if requests_per_second is not None:
+        config.requests_per_second = str(requests_per_second)
+    fds = FootballDataScraper(league, season)
+    lock = ShardLock(f'{fds.data_fld}shard.lock')
+    if not lock.acquire():
+        logging.info(f'Shard {fds.shard} is locked by another process, skipping')
+        return 'locked'
+    try:
+        checkpoint = Checkpoint(f'{fds.data_fld}pipeline_checkpoint.json', heartbeat=lock.refresh)
+        run(fds, checkpoint, stages, workers, refresh, retries, retry_wait)
+        checkpoint.finish()
+        return 'done'
+    except Exception as e:
+        logging.exception(f'Shard {fds.shard} failed')
+        return f'failed: {e}'
+    finally:
+        fds.write_metrics()
+        lock.release()
+
+
+def build_index(shards):
+    """
+    Merges the outputs of the shards into <output_fld>index/: matches.ndjson with the league and season of each match,
+    and teams.ndjson and players.ndjson with each team and player once, along with the shards they appear in.
+    Shards without outputs are skipped.
+
+    Returns:
+        dict: Number of matches, teams and players indexed.
+    """
+    folder = f'{config.output_fld}index/'
+    os.makedirs(folder, exist_ok=True)
+    teams = {}
+    players = {}
+    matches = 0
+    with NdjsonWriter(folder, ['matches', 'teams', 'players']) as writer:
+        for league, season in shards:
+            output_fld = f'{config.output_fld}{league}/{season}/'
+            if not dataset_exists(output_fld, 'matches'):
+                logging.warning(f'No outputs for shard {league}/{season}, left out of the index')
+                continue
+            shard = f'{league}/{season}'
+            for match in iter_dataset(output_fld, 'matches'):
+                writer.write('matches', [dict({field: match.get(field) for field in INDEX_FIELDS}, league=league, season=season)])
+                matches += 1
+            for team in iter_dataset(output_fld, 'team_details'):
+                entry = teams.setdefault(team['id'], dict(team, shards=[]))
+                entry['shards'].append(shard)
+            # Later seasons overwrite a player's name, number and team, the shards keep their history
+            for player in iter_dataset(output_fld, 'player_details'):
+                entry = players.setdefault(player['id'], {'shards': [], 'team_ids': []})
+                entry.update(player)
+                entry['shards'].append(shard)
+                if player.get('team_id') not in entry['team_ids']:
+                    entry['team_ids'].append(player.get('team_id'))
+        writer.write('teams', teams.values())
+        writer.write('players', players.values())
+    logging.info(f'Indexed {matches} matches, {len(teams)} teams and {len(players)} players from {len(shards)} shards')
+    return {'matches': matches, 'teams': len(teams), 'players': len(players)}
+
+
+def run_shards(shards, processes=None, **options):
+    """
+    Runs the shards across worker processes, see build_index to merge their outputs.
+
+    Every shard fetches from the same host, so requests_per_second in footballscraper.config is split evenly between
+    the processes running at once, keeping the combined rate within the limit.
+
+    Args:
+        shards (list): (league, season) pairs.
+        processes (int, optional): Shards run at once. Default is shard_processes in footballscraper.config.
+        **options: Passed on to run_shard, e.g. stages or workers.
+
+    Returns:
+        dict: The result of run_shard for each shard, keyed by 'league/season'.
+    """
+    processes = processes or int(config.shard_processes)
+    rate = float(config.requests_per_second) / max(1, min(processes, len(shards)))
+    results = {}
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {f'{league}/{season}': executor.submit(run_shard, league, season, requests_per_second=rate, **options)
+                   for league, season in shards}
+        for shard, future in futures.items():
+            results[shard] = future.result()
+            logging.info(f'Shard {shard}: {results[shard]}')
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scrape several leagues and seasons in parallel and index them together.')
+    parser.add_argument('--leagues', nargs='+', help='ESPN league codes, default is leagues in footballscraper.config.')
+    parser.add_argument('--seasons', help='Season start years, e.g. 2013-2022 or 2020,2022. Default is seasons in footballscraper.config.')
+    parser.add_argument('--processes', type=int, help='Shards run at once, default is shard_processes in footballscraper.config.')
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES, help='Pipeline stages to run, default is all.')
+    parser.add_argument('--workers', type=int, default=1, help='Processes used to parse the pages of each shard.')
+    parser.add_argument('--refresh', action='store_true', help='Revalidate every page, not just those missing or past their time to live.')
+    parser.add_argument('--retries', type=int, default=2, help='Passes over the failed pages after each fetching stage.')
+    parser.add_argument('--retry-wait', type=float, default=60, help='Seconds to wait before each retry pass.')
+    parser.add_argument('--index-only', action='store_true', help='Only rebuild the index from the shard outputs.')
+    args = parser.parse_args(argv)
+
+    leagues = args.leagues or config.leagues.replace(',', ' ').split()
+    seasons = parse_seasons(args.seasons or config.seasons)
+    shards = [(league, season) for league in leagues for season in seasons]
+
+    if not args.index_only:
+        results = run_shards(shards, args.processes, stages=args.stages, workers=args.workers, refresh=args.refresh,
+                             retries=args.retries, retry_wait=args.retry_wait)
+        for shard, result in results.items():
+            print(f'{shard}: {result}')
+    counts = build_index(shards)
+    print(f'Index: {counts["matches"]} matches, {counts["teams"]} teams, {counts["players"]} players in {config.output_fld}index/')
+
+
+if __name__ == '__main__':
+    main()
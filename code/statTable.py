@@ -0,0 +1,206 @@
+import array, math, re
+
+from code.tableExport import SCHEMAS
+
+# How each column type in SCHEMAS is held: category and string columns as codes into a list of distinct values
+KINDS = {'category':'code', 'string':'code', 'datetime':'code', 'int16':'int', 'int32':'int', 'bool':'bool', 'float32':'float'}
+TYPECODES = {'code':'i', 'int':'i', 'bool':'b', 'float':'d'}
+
+# Stored in place of a key the record does not have
+MISSING_INT = -2 ** 31
+MISSING = {'code':-1, 'int':MISSING_INT, 'bool':-1, 'float':math.nan}
+ABSENT = object()
+
+INT_TEXT = re.compile(r'-?\d+')
+
+
+def _is_int(value):
+    if isinstance(value, str):
+        return INT_TEXT.fullmatch(value) is not None and str(int(value)) == value
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _float_text(value):
+    """A float as the parsers write it, e.g. '48' or '48.5'."""
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class StatTable():
+    """
+    player_stats or team_stats records held as typed columns rather than a list of dictionaries, one array.array per column.
+
+    Ids, sides and other strings are stored as int codes into a list of their distinct values, so every team and player id
+    is held once. Stats are 32 bit ints, flags one byte and possession a float. A row costs a few bytes per column however
+    many rows there are, against a dictionary of string values per row.
+
+    Rows read back exactly as they were added: the same keys, and each value with its type, so '3' comes back as '3' and
+    3 as 3. A typed column whose values cannot be given back that way (a stat that is not a whole number, a None, a mix
+    of '3' and 3) turns into a column of codes. The columns in tableExport.SCHEMAS are always present, other player
+    data-stats get a column when first seen.
+
+    to_pandas builds a typed DataFrame from the arrays without going through the rows.
+
+    Parameters
+    ----------
+    name : str
+        'player_stats' or 'team_stats'.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.columns = {}
+        self.kinds = {}
+        self.categories = {}
+        # Whether the values of each int and float column were added as text
+        self.text = {}
+        for column, type_name in SCHEMAS[name].items():
+            self._add_column(column, KINDS[type_name])
+
+    @classmethod
+    def from_records(cls, name, records):
+        table = cls(name)
+        table.extend(records)
+        return table
+
+    def _add_column(self, column, kind):
+        self.columns[column] = array.array(TYPECODES[kind], [MISSING[kind]]) * self.rows
+        self.kinds[column] = kind
+        if kind == 'code':
+            self.categories[column] = ([], {})
+
+    def _to_code_column(self, column):
+        values = [self._decode(column, i) for i in range(self.rows)]
+        self.kinds[column] = 'code'
+        self.categories[column] = ([], {})
+        self.text.pop(column, None)
+        self.columns[column] = array.array('i', (self._code(column, value) for value in values))
+
+    def _code(self, column, value):
+        if value is ABSENT:
+            return -1
+        values, codes = self.categories[column]
+        # Keyed by type too, so 1, '1' and True keep their own codes
+        key = (value.__class__, value)
+        code = codes.get(key)
+        if code is None:
+            code = codes[key] = len(values)
+            values.append(value)
+        return code
+
+    def _encode_typed(self, column, kind, value):
+        """The value as stored in a typed column, None when the column could not give it back as it was added."""
+        if value is ABSENT:
+            return MISSING[kind]
+        if kind == 'bool':
+            return int(value) if isinstance(value, bool) else None
+        text = isinstance(value, str)
+        if self.text.setdefault(column, text) != text:
+            return None
+        if kind == 'int':
+            if not _is_int(value) or not MISSING_INT < int(value) < 2 ** 31:
+                return None
+            return int(value)
+        if text:
+            try:
+                number = float(value)
+            except ValueError:
+                return None
+            return number if not math.isnan(number) and _float_text(number) == value else None
+        return value if isinstance(value, float) and not math.isnan(value) else None
+
+    def _encode(self, column, value):
+        kind = self.kinds[column]
+        if kind != 'code':
+            encoded = self._encode_typed(column, kind, value)
+            if encoded is not None:
+                return encoded
+            self._to_code_column(column)
+        return self._code(column, value)
+
+    def _decode(self, column, i):
+        value = self.columns[column][i]
+        kind = self.kinds[column]
+        if kind == 'code':
+            return ABSENT if value == -1 else self.categories[column][0][value]
+        if kind == 'bool':
+            return ABSENT if value == -1 else bool(value)
+        if kind == 'int':
+            if value == MISSING_INT:
+                return ABSENT
+            return str(value) if self.text.get(column) else value
+        if math.isnan(value):
+            return ABSENT
+        return _float_text(value) if self.text.get(column) else value
+
+    def append(self, record):
+        for column, value in record.items():
+            if column not in self.columns:
+                self._add_column(column, 'int' if _is_int(value) else 'code')
+        for column in list(self.columns):
+            # Encoded first, as it may replace the column's array
+            encoded = self._encode(column, record.get(column, ABSENT))
+            self.columns[column].append(encoded)
+        self.rows += 1
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.rows))]
+        if i < 0:
+            i += self.rows
+        if not 0 <= i < self.rows:
+            raise IndexError(f'{self.name} row {i} out of range')
+        record = {}
+        for column in self.columns:
+            value = self._decode(column, i)
+            if value is not ABSENT:
+                record[column] = value
+        return record
+
+    def __iter__(self):
+        for i in range(self.rows):
+            yield self[i]
+
+    def nbytes(self):
+        """Approximate bytes held by the columns and the distinct string values."""
+        size = sum(values.itemsize * len(values) for values in self.columns.values())
+        return size + sum(len(value) for values, _ in self.categories.values() for value in values if isinstance(value, str))
+
+    def to_pandas(self, columns=None):
+        """
+        Returns:
+            pandas.DataFrame: Code columns as categoricals, stats as nullable Int32, flags as nullable boolean and floats
+                as float64. Missing keys and None are NA.
+        """
+        import numpy as np
+        import pandas as pd
+
+        data = {}
+        for column in columns or self.columns:
+            values, kind = self.columns[column], self.kinds[column]
+            if kind == 'code':
+                codes = np.frombuffer(values, dtype=np.int32)
+                categories = self.categories[column][0]
+                if None in categories:
+                    # None is not a valid category, its rows are NA like those without the key
+                    remap = np.full(len(categories) + 1, -1, dtype=np.int32)
+                    kept = [code for code, value in enumerate(categories) if value is not None]
+                    remap[kept] = np.arange(len(kept), dtype=np.int32)
+                    codes = remap[codes]
+                    categories = [categories[code] for code in kept]
+                data[column] = pd.Categorical.from_codes(codes, categories)
+            elif kind == 'int':
+                ints = np.frombuffer(values, dtype=np.int32)
+                data[column] = pd.arrays.IntegerArray(ints.copy(), ints == MISSING_INT)
+            elif kind == 'bool':
+                flags = np.frombuffer(values, dtype=np.int8)
+                data[column] = pd.arrays.BooleanArray(flags == 1, flags == -1)
+            else:
+                data[column] = np.frombuffer(values, dtype=np.float64).copy()
+        return pd.DataFrame(data)
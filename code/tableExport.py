@@ -0,0 +1,120 @@
+import importlib.util
+from datetime import datetime
+
+# pyarrow is optional, it is only needed to export and read the columnar tables
+if importlib.util.find_spec('pyarrow') is not None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+else:
+    pa = None
+
+# Stat columns, as they appear in the records, and their arrow type names
+MATCH_COLUMNS = {'id':'string', 'venue':'category', 'date_time':'datetime', 'address':'string', 'attendance':'int32',
+                 'referee':'category', 'status':'category', 'home_side_id':'category', 'away_side_id':'category',
+                 'home_score':'int16', 'away_score':'int16'}
+TEAM_STAT_COLUMNS = {'id':'category', 'match_id':'string', 'side':'category', 'score':'int16', 'fouls_committed':'int16',
+                     'yellow_cards':'int16', 'red_cards':'int16', 'offsides':'int16', 'corners':'int16', 'saves':'int16',
+                     'possession':'float32', 'shots_on_target':'int16', 'shots_off_target':'int16'}
+PLAYER_STAT_COLUMNS = {'id':'category', 'match_id':'string', 'team_id':'category', 'is_sub':'bool', 'played':'bool',
+                       'subbed_for':'string', 'subbed_time':'string', 'player_no':'int16'}
+TEAM_DETAIL_COLUMNS = {'id':'string', 'long_name':'string', 'short_name':'string', 'abbrev':'string', 'page_url':'string'}
+PLAYER_DETAIL_COLUMNS = {'id':'string', 'team_id':'category', 'player_link':'string', 'player_name':'string', 'player_no':'int16'}
+COMMENTARY_COLUMNS = {'match_id':'category', 'order':'int32', 'minute':'int16', 'added_time':'int16', 'type':'category',
+                      'description':'string'}
+
+SCHEMAS = {'matches':MATCH_COLUMNS, 'team_stats':TEAM_STAT_COLUMNS, 'player_stats':PLAYER_STAT_COLUMNS,
+           'team_details':TEAM_DETAIL_COLUMNS, 'player_details':PLAYER_DETAIL_COLUMNS, 'commentary':COMMENTARY_COLUMNS}
+
+FORMATS = {'parquet': '.parquet', 'feather': '.arrow'}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError('pyarrow is required to export or read tables, install it with pip install pyarrow')
+
+
+def _arrow_type(type_name):
+    return {'string': pa.string(), 'category': pa.dictionary(pa.int32(), pa.string()), 'datetime': pa.timestamp('s'),
+            'int16': pa.int16(), 'int32': pa.int32(), 'float32': pa.float32(), 'bool': pa.bool_()}[type_name]
+
+
+def convert_value(value, type_name):
+    """Casts a scraped string value to the python type of its column, blanks and 'None' become nulls."""
+    if value is None or value == '' or value == 'None':
+        return None
+    if type_name in ('int16', 'int32'):
+        value = str(value).replace(',', '').strip()
+        return int(value) if value.lstrip('-').isdigit() else None
+    if type_name == 'float32':
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    if type_name == 'bool':
+        return value if isinstance(value, bool) else str(value) == 'True'
+    if type_name == 'datetime':
+        return datetime.strptime(value, '%Y-%m-%d %H:%M')
+    return str(value)
+
+
+def flatten_commentary(records):
+    """One row per comment rather than one record per match, with the match id in the same M<id> form as matches."""
+    for match in records:
+        for comment in match['comments']:
+            yield dict(comment, match_id=f"M{match['id']}")
+
+
+def build_table(name, records):
+    """
+    Builds a typed arrow table from the records of a dataset.
+
+    The columns listed in SCHEMAS are always present with their defined type. For player_stats, every other
+    data-stat found in the records is added as an int32 column when all its values are whole numbers, or as a string column otherwise.
+    Team stats entries left empty for games that were not finished are skipped.
+    """
+    _require_pyarrow()
+    columns = dict(SCHEMAS[name])
+    if name == 'commentary':
+        records = flatten_commentary(records)
+    rows = [record for record in records if record]
+
+    if name == 'player_stats':
+        extra = {}
+        for record in rows:
+            for key, value in record.items():
+                if key not in columns:
+                    numeric = value in (None, '') or str(value).lstrip('-').isdigit()
+                    extra[key] = extra.get(key, True) and numeric
+        columns.update({key: 'int32' if numeric else 'string' for key, numeric in extra.items()})
+
+    data = {column: [convert_value(record.get(column), type_name) for record in rows] for column, type_name in columns.items()}
+    schema = pa.schema([(column, _arrow_type(type_name)) for column, type_name in columns.items()])
+    arrays = []
+    for column, type_name in columns.items():
+        if type_name == 'category':
+            arrays.append(pa.array(data[column], pa.string()).dictionary_encode().cast(_arrow_type(type_name)))
+        else:
+            arrays.append(pa.array(data[column], _arrow_type(type_name)))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_table(table, path, fmt='parquet'):
+    """Writes a table zstd compressed, as parquet or as an arrow IPC (feather) file that can be memory mapped."""
+    _require_pyarrow()
+    if fmt == 'parquet':
+        pq.write_table(table, path, compression='zstd')
+    else:
+        feather.write_feather(table, path, compression='zstd')
+
+
+def read_table(path, columns=None, fmt='parquet', filters=None):
+    """
+    Reads a table memory mapped, optionally only some of its columns and only the rows matching filters,
+    given as in pyarrow.parquet.read_table, e.g. [('type', '=', 'goal')].
+    """
+    _require_pyarrow()
+    if fmt == 'parquet':
+        return pq.read_table(path, columns=columns, memory_map=True, filters=filters)
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.filter(pq.filters_to_expression(filters)) if filters else table
@@ -0,0 +1,144 @@
+import sqlite3, logging
+
+from code.tableExport import convert_value
+
+# Table definitions: column name and SQLite type, the primary key and the columns indexed for lookups
+TABLES = {
+    'matches': {
+        'columns': {'id':'TEXT', 'venue':'TEXT', 'date_time':'TEXT', 'address':'TEXT', 'attendance':'INTEGER', 'referee':'TEXT',
+                    'status':'TEXT', 'home_side_id':'TEXT', 'away_side_id':'TEXT', 'home_score':'INTEGER', 'away_score':'INTEGER'},
+        'key': ['id'],
+        'indexes': [['date_time'], ['home_side_id', 'date_time'], ['away_side_id', 'date_time']]},
+    'teams': {
+        'columns': {'id':'TEXT', 'long_name':'TEXT', 'short_name':'TEXT', 'abbrev':'TEXT', 'page_url':'TEXT'},
+        'key': ['id'],
+        'indexes': []},
+    'players': {
+        'columns': {'id':'TEXT', 'team_id':'TEXT', 'player_link':'TEXT', 'player_name':'TEXT', 'player_no':'INTEGER'},
+        'key': ['id'],
+        'indexes': [['team_id']]},
+    'team_stats': {
+        'columns': {'match_id':'TEXT', 'team_id':'TEXT', 'side':'TEXT', 'score':'INTEGER', 'fouls_committed':'INTEGER',
+                    'yellow_cards':'INTEGER', 'red_cards':'INTEGER', 'offsides':'INTEGER', 'corners':'INTEGER', 'saves':'INTEGER',
+                    'possession':'REAL', 'shots_on_target':'INTEGER', 'shots_off_target':'INTEGER'},
+        'key': ['match_id', 'side'],
+        'indexes': [['team_id']]},
+    'player_stats': {
+        'columns': {'match_id':'TEXT', 'player_id':'TEXT', 'team_id':'TEXT', 'is_sub':'INTEGER', 'played':'INTEGER',
+                    'subbed_for':'TEXT', 'subbed_time':'TEXT', 'player_no':'INTEGER'},
+        'key': ['match_id', 'player_id'],
+        'indexes': [['player_id'], ['team_id']]},
+    'commentary': {
+        'columns': {'match_id':'TEXT', 'order':'INTEGER', 'minute':'INTEGER', 'added_time':'INTEGER', 'type':'TEXT', 'description':'TEXT'},
+        'key': ['match_id', 'order'],
+        'indexes': [['type'], ['match_id', 'minute']]},
+}
+
+# Record keys renamed to their column, per table
+RENAMES = {'team_stats': {'id':'team_id'}, 'player_stats': {'id':'player_id'}}
+
+SQL_TYPES = {'INTEGER':'int32', 'REAL':'float32', 'TEXT':'string'}
+
+
+def _quote(name):
+    return f'"{name}"'
+
+
+class Warehouse():
+    """
+    An SQLite database of the scraped datasets, with tables for matches, teams, players, team_stats, player_stats and commentary,
+    indexed on match, team, player and date. Records are upserted in bulk inside a transaction, so re-loading a season
+    or loading several seasons into the same database never duplicates rows.
+
+    Parameters
+    ----------
+    path : str
+        Path of the database file, created if it does not exist.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.conn:
+            for table, definition in TABLES.items():
+                columns = ', '.join(f'{_quote(column)} {sql_type}' for column, sql_type in definition['columns'].items())
+                key = ', '.join(_quote(column) for column in definition['key'])
+                self.conn.execute(f'CREATE TABLE IF NOT EXISTS {table} ({columns}, PRIMARY KEY ({key}))')
+                # Databases created by earlier versions get the columns added since
+                existing = set(self._columns(table))
+                for column, sql_type in definition['columns'].items():
+                    if column not in existing:
+                        logging.info(f'Adding column {column} to {table}')
+                        self.conn.execute(f'ALTER TABLE {table} ADD COLUMN {_quote(column)} {sql_type}')
+                for index in definition['indexes']:
+                    name = f'idx_{table}_{"_".join(index)}'
+                    self.conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(_quote(c) for c in index)})')
+
+    def _columns(self, table):
+        return [row[1] for row in self.conn.execute(f'PRAGMA table_info({table})')]
+
+    def _add_columns(self, table, columns):
+        """Adds player data-stat columns seen for the first time, e.g. a new ESPN stat."""
+        existing = set(self._columns(table))
+        for column in columns:
+            if column not in existing:
+                logging.info(f'Adding column {column} to {table}')
+                self.conn.execute(f'ALTER TABLE {table} ADD COLUMN {_quote(column)} INTEGER')
+
+    def upsert(self, table, records):
+        """
+        Inserts or updates records in one transaction.
+
+        Args:
+            table (str): One of the tables in TABLES.
+            records (iterable): Records as produced by get_match_data / get_commentary_data, empty records are skipped.
+
+        Returns:
+            int: Number of records written.
+        """
+        definition = TABLES[table]
+        renames = RENAMES.get(table, {})
+        rows = [{renames.get(key, key): value for key, value in record.items()} for record in records if record]
+        if not rows:
+            return 0
+
+        with self.conn:
+            if table == 'player_stats':
+                self._add_columns(table, {key for row in rows for key in row})
+            columns = self._columns(table)
+            types = {column: SQL_TYPES[sql_type] for column, sql_type in definition['columns'].items()}
+            values = [tuple(self._value(row.get(column), types.get(column)) for column in columns) for row in rows]
+
+            updates = ', '.join(f'{_quote(c)}=excluded.{_quote(c)}' for c in columns if c not in definition['key'])
+            placeholders = ', '.join('?' for _ in columns)
+            self.conn.executemany(f'INSERT INTO {table} ({", ".join(_quote(c) for c in columns)}) VALUES ({placeholders}) '
+                                  f'ON CONFLICT({", ".join(_quote(c) for c in definition["key"])}) DO UPDATE SET {updates}', values)
+        return len(rows)
+
+    @staticmethod
+    def _value(value, type_name):
+        """Casts scraped strings to the column type, data-stat columns are stored as integers when they are whole numbers."""
+        if type_name is None:
+            return convert_value(value, 'int32') if value is not None and str(value).lstrip('-').isdigit() else convert_value(value, 'string')
+        if isinstance(value, bool):
+            return int(value)
+        return convert_value(value, type_name)
+
+    def query(self, sql, params=()):
+        """Runs a query and returns its rows as dictionaries."""
+        cursor = self.conn.execute(sql, params)
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
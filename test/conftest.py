@@ -0,0 +1,36 @@
+import pytest
+
+from code.FootballScraper import FootballDataScraper, config
+from code.pageStore import PageStore
+from benchmarks.pageGenerator import match_page
+
+# Game id, home team, away team, finished
+GAMES = [(600001, 1, 2, True), (600002, 2, 3, True), (600003, 3, 1, True), (600004, 1, 3, False)]
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    """A FootballDataScraper working in a scratch folder rather than the folders in footballscraper.config."""
+    for name, folder in [('data_fld', 'data/'), ('games_fld', 'data/games/'), ('output_fld', 'data/output/'), ('log_fld', 'log/')]:
+        monkeypatch.setattr(config, name, f'{tmp_path}/{folder}')
+    return FootballDataScraper()
+
+
+@pytest.fixture
+def match_files(scraper, request):
+    """
+    Paths of generated match pages saved in the scraper's games folder, in the order of GAMES or of the games given
+    with @pytest.mark.parametrize('match_files', [games], indirect=True).
+    """
+    store = PageStore.from_config(config, scraper.games_fld)
+    games = getattr(request, 'param', GAMES)
+    for game_id, home, away, finished in games:
+        store.write(f'match_{game_id}', match_page(game_id, home, away, finished=finished))
+    return [store.path(f'match_{game_id}') for game_id, *_ in games]
+
+
+@pytest.fixture
+def parsed(scraper, match_files):
+    """The scraper after get_match_data has parsed the match_files pages and written its outputs."""
+    scraper.get_match_data(from_file=False)
+    return scraper
@@ -0,0 +1,60 @@
+from code.aggregates import SeasonAggregates
+
+
+def _expected_standings(scraper):
+    table = {}
+    for match in scraper.matches:
+        if match['status'] != 'FT':
+            continue
+        home, away = int(match['home_score']), int(match['away_score'])
+        for team_id, goals_for, goals_against in [(match['home_side_id'], home, away), (match['away_side_id'], away, home)]:
+            row = table.setdefault(team_id, {'played': 0, 'points': 0, 'goals_for': 0, 'goals_against': 0})
+            row['played'] += 1
+            row['points'] += 3 if goals_for > goals_against else 1 if goals_for == goals_against else 0
+            row['goals_for'] += goals_for
+            row['goals_against'] += goals_against
+    return table
+
+
+def test_unplayed_matches_do_not_stop_the_season(parsed):
+    assert len(parsed.matches) == 4
+    assert {match['status'] for match in parsed.matches} == {'FT', '19:45'}
+    assert parsed.aggregates.match_ids == {'M600001', 'M600002', 'M600003', 'M600004'}
+    assert sum(row['played'] for row in parsed.standings()) == 6
+
+
+def test_standings_match_the_records(parsed):
+    expected = _expected_standings(parsed)
+    standings = parsed.standings()
+    assert {row['team_id']: {key: row[key] for key in ('played', 'points', 'goals_for', 'goals_against')} for row in standings} == expected
+    keys = [(row['points'], row['goal_difference'], row['goals_for']) for row in standings]
+    assert keys == sorted(keys, reverse=True)
+    assert standings[0]['team'] == parsed.team_details[standings[0]['team_id']]['long_name']
+
+
+def test_player_totals_match_the_records(parsed):
+    goals = {}
+    for record in parsed.player_stats:
+        goals[record['id']] = goals.get(record['id'], 0) + int(record['totalGoals'])
+    top = parsed.top_players('totalGoals', 3)
+    assert [row['totalGoals'] for row in top] == sorted(goals.values(), reverse=True)[:3]
+    assert all(goals[row['player_id']] == row['totalGoals'] for row in top)
+    totals = parsed.player_totals(top[0]['player_id'])
+    assert totals['apps'] == totals['starts'] + totals['sub_apps']
+
+
+def test_team_form_is_most_recent_first(parsed):
+    form = parsed.team_form('T1')
+    assert len(form['form']) == 2
+    dates = [result['date_time'] for result in form['results']]
+    assert dates == sorted(dates, reverse=True)
+
+
+def test_matches_are_added_once_and_saved(parsed, tmp_path):
+    aggregates = parsed.aggregates
+    result = {'match': {'id': 'M600001'}, 'team_stats': [], 'player_stats': []}
+    assert not aggregates.add_match(result)
+    aggregates.save(f'{tmp_path}/aggregates.json')
+    loaded = SeasonAggregates.load(f'{tmp_path}/aggregates.json')
+    assert loaded.standings() == aggregates.standings()
+    assert loaded.venue_attendance() == aggregates.venue_attendance()
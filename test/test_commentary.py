@@ -0,0 +1,61 @@
+import pytest
+
+import code.FootballScraper as scraper
+from code.commentary import EventType, parse_commentary, parse_timestamp
+from benchmarks.pageGenerator import commentary_page
+
+# ESPN data-type values as they appear on commentary pages
+ESPN_TYPES = [('goal', EventType.GOAL), ('goal---header', EventType.GOAL), ('goal---free-kick', EventType.GOAL),
+              ('goal---left-footed-shot', EventType.GOAL), ('goal---penalty', EventType.GOAL),
+              ('penalty---scored', EventType.GOAL), ('penalty---saved', EventType.PENALTY_SAVED),
+              ('penalty---missed', EventType.PENALTY_MISSED), ('penalty---won', EventType.PENALTY),
+              ('penalty---conceded', EventType.PENALTY), ('own-goal', EventType.OWN_GOAL),
+              ('yellow-card', EventType.YELLOW_CARD), ('yellow-red-card', EventType.RED_CARD),
+              ('second-yellow-card', EventType.RED_CARD), ('red-card', EventType.RED_CARD),
+              ('substitution', EventType.SUBSTITUTION), ('attempt-saved', EventType.SHOT_SAVED),
+              ('attempt-missed', EventType.SHOT_MISSED), ('attempt-blocked', EventType.SHOT_BLOCKED),
+              ('shot-hit-the-post', EventType.SHOT_WOODWORK), ('shot-hit-the-bar', EventType.SHOT_WOODWORK),
+              ('foul', EventType.FOUL), ('hand-ball', EventType.HANDBALL), ('free-kick-won', EventType.FREE_KICK),
+              ('corner-kick', EventType.CORNER), ('offside', EventType.OFFSIDE), ('var---goal-disallowed', EventType.VAR),
+              ('var-decision', EventType.VAR), ('delay-in-match', EventType.DELAY), ('half-time', EventType.PERIOD),
+              ('end-regular-time', EventType.PERIOD), ('kickoff', EventType.PERIOD), ('', EventType.OTHER),
+              (None, EventType.OTHER), ('something-new', EventType.OTHER)]
+
+
+@pytest.mark.parametrize('data_type, event_type', ESPN_TYPES)
+def test_espn_data_types(data_type, event_type):
+    assert EventType.from_espn(data_type) is event_type
+    assert EventType.from_espn(data_type.upper() if data_type else data_type) is event_type
+
+
+def test_event_types_are_plain_strings():
+    assert EventType.GOAL == 'goal'
+    assert str(EventType.PENALTY_SAVED) == 'penalty-saved'
+
+
+@pytest.mark.parametrize('text, expected', [("12'", (12, 0)), ("45'+2'", (45, 2)), ('90+3', (90, 3)), ('-', (None, None)), ('', (None, None))])
+def test_parse_timestamp(text, expected):
+    assert parse_timestamp(text) == expected
+
+
+def test_parse_commentary_rows():
+    page = ('<table><tr data-id="comment-9912301" data-type="penalty---scored"><td class="time-stamp">45\'+2\'</td>'
+            '<td class="game-details">\n Goal! Team 1 1, Team 2 0. Player 1 converts the penalty &amp; celebrates.\n</td></tr>'
+            '<tr data-id="comment-9912302" data-type="yellow-red-card"><td class="time-stamp">67\'</td>'
+            '<td class="game-details">Player 2 (Team 2) is shown the <b>second yellow</b> card.</td></tr>'
+            '<tr data-id="comment-9912303" data-type=""><td class="time-stamp">-</td>'
+            '<td class="game-details">Lineups are announced.</td></tr></table>')
+    events = parse_commentary(page)
+    assert events == [
+        {'order': 9912301, 'minute': 45, 'added_time': 2, 'type': EventType.GOAL,
+         'description': 'Goal! Team 1 1, Team 2 0. Player 1 converts the penalty & celebrates.'},
+        {'order': 9912302, 'minute': 67, 'added_time': 0, 'type': EventType.RED_CARD,
+         'description': 'Player 2 (Team 2) is shown the second yellow card.'},
+        {'order': 9912303, 'minute': None, 'added_time': None, 'type': EventType.OTHER, 'description': 'Lineups are announced.'}]
+
+
+def test_regex_and_soup_readers_agree():
+    page = commentary_page(600001)
+    events = parse_commentary(page)
+    assert len(events) == 90
+    assert events == scraper._commentary_soup_events(page)
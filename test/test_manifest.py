@@ -0,0 +1,117 @@
+import json, os
+
+import pytest
+
+import code.FootballScraper as scraper_module
+from code.datasets import NdjsonWriter, iter_dataset
+from code.pageStore import PageStore
+from benchmarks.pageGenerator import match_page
+
+PARSED = []
+
+
+def parse_length(path):
+    PARSED.append(path)
+    with open(path, 'r') as f:
+        return {'file': os.path.basename(path), 'length': len(f.read())}
+
+
+def _pages(scraper, contents):
+    files = []
+    for name, content in contents.items():
+        path = f'{scraper.games_fld}{name}'
+        with open(path, 'w') as f:
+            f.write(content)
+        files.append(path)
+    return files
+
+
+def _run(scraper, files):
+    PARSED.clear()
+    records, changed, save_manifest = scraper._parse_changed_files(parse_length, files, 1, f'{scraper.output_fld}manifest.ndjson')
+    records = list(records)
+    save_manifest()
+    return records, changed
+
+
+def test_unchanged_files_are_not_parsed_again(scraper):
+    files = _pages(scraper, {'match_1.html': 'a', 'match_2.html': 'bb'})
+    records, changed = _run(scraper, files)
+    assert changed and PARSED == files
+    assert records == [{'file': 'match_1.html', 'length': 1}, {'file': 'match_2.html', 'length': 2}]
+
+    again, changed = _run(scraper, files)
+    assert not changed and PARSED == []
+    assert again == records
+
+
+def test_only_changed_files_are_parsed(scraper):
+    files = _pages(scraper, {'match_1.html': 'a', 'match_2.html': 'bb'})
+    _run(scraper, files)
+    _pages(scraper, {'match_2.html': 'ccc'})
+    records, changed = _run(scraper, files)
+    assert changed and PARSED == [files[1]]
+    assert records[1] == {'file': 'match_2.html', 'length': 3}
+
+
+def test_touched_file_with_same_content_is_not_parsed(scraper):
+    files = _pages(scraper, {'match_1.html': 'a'})
+    _run(scraper, files)
+    stat = os.stat(files[0])
+    os.utime(files[0], (stat.st_atime + 10, stat.st_mtime + 10))
+    _, changed = _run(scraper, files)
+    assert not changed and PARSED == []
+
+
+def test_removed_files_are_dropped_from_the_manifest(scraper):
+    files = _pages(scraper, {'match_1.html': 'a', 'match_2.html': 'bb'})
+    _run(scraper, files)
+    records, changed = _run(scraper, files[:1])
+    assert changed and PARSED == [] and len(records) == 1
+    with open(f'{scraper.output_fld}manifest.ndjson', 'r') as f:
+        assert [json.loads(line)['path'] for line in f] == files[:1]
+
+
+def test_new_parser_version_parses_everything_again(scraper, monkeypatch):
+    files = _pages(scraper, {'match_1.html': 'a', 'match_2.html': 'bb'})
+    _run(scraper, files)
+    monkeypatch.setattr(scraper_module, 'PARSER_VERSION', scraper_module.PARSER_VERSION + 1)
+    _, changed = _run(scraper, files)
+    assert changed and PARSED == files
+
+
+def test_manifest_is_not_saved_before_the_outputs(scraper):
+    files = _pages(scraper, {'match_1.html': 'a'})
+    PARSED.clear()
+    records, changed, _ = scraper._parse_changed_files(parse_length, files, 1, f'{scraper.output_fld}manifest.ndjson')
+    list(records)
+    assert changed and not os.path.isfile(f'{scraper.output_fld}manifest.ndjson')
+
+
+def test_records_are_read_and_parsed_as_they_are_used(scraper):
+    files = _pages(scraper, {'match_1.html': 'a', 'match_2.html': 'bb'})
+    _run(scraper, files)
+    _pages(scraper, {'match_2.html': 'ccc'})
+    PARSED.clear()
+    records, changed, _ = scraper._parse_changed_files(parse_length, files, 1, f'{scraper.output_fld}manifest.ndjson')
+    assert changed and PARSED == []
+    assert next(records) == {'file': 'match_1.html', 'length': 1} and PARSED == []
+    assert next(records) == {'file': 'match_2.html', 'length': 3} and PARSED == [files[1]]
+
+
+def test_interrupted_write_is_parsed_again(scraper, monkeypatch):
+    store = PageStore.from_config(scraper_module.config, scraper.games_fld)
+    store.write('match_600001', match_page(600001, 1, 2, finished=False))
+    scraper.get_match_data(from_file=False)
+
+    # The game finishes, but the run stops before the outputs are replaced
+    store.write('match_600001', match_page(600001, 1, 2, finished=True))
+    def fail(writer):
+        raise OSError('disk full')
+    with monkeypatch.context() as m:
+        m.setattr(NdjsonWriter, 'close', fail)
+        with pytest.raises(OSError):
+            scraper.get_match_data(from_file=False)
+
+    scraper.get_match_data(from_file=False)
+    assert [match['status'] for match in iter_dataset(scraper.output_fld, 'matches')] == ['FT']
@@ -0,0 +1,65 @@
+import threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from code.pageFetcher import PageFetcher, RateLimiter
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    requests = 0
+
+    def do_GET(self):
+        CountingHandler.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    CountingHandler.requests = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CountingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetches_every_url(site):
+    fetcher = PageFetcher(max_workers=4, requests_per_second=0)
+    urls = [f'{site}/page/{i}' for i in range(20)]
+    results = list(fetcher.fetch_all(urls))
+    fetcher.close()
+    assert sorted(url for url, _, _ in results) == sorted(urls)
+    assert all(response.status_code == 200 for _, response, _ in results)
+
+
+def test_stopping_early_cancels_the_queued_pages(site):
+    fetcher = PageFetcher(max_workers=4, requests_per_second=20)
+    urls = [f'{site}/page/{i}' for i in range(200)]
+    start = time.monotonic()
+    with pytest.raises(KeyboardInterrupt):
+        try:
+            for url, response, error in fetcher.fetch_all(urls):
+                raise KeyboardInterrupt
+        finally:
+            fetcher.close()
+    assert time.monotonic() - start < 2
+    time.sleep(0.5)
+    # Only the requests already running when the consumer stopped were sent
+    assert CountingHandler.requests <= 10
+
+
+def test_rate_limiter_spaces_requests_per_host():
+    limiter = RateLimiter(20)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.wait('example.com')
+    limiter.wait('other.example.com')
+    assert 0.19 <= time.monotonic() - start < 0.5
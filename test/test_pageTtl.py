@@ -0,0 +1,23 @@
+from code.FootballScraper import config
+from code.pageStore import PageStore
+from benchmarks.pageGenerator import match_page, commentary_page
+
+MATCH_URL = 'https://www.espn.co.uk/football/match/_/gameId/600001'
+COMMENTARY_URL = 'https://www.espn.co.uk/football/commentary/_/gameId/600001'
+
+
+def test_match_page_ttl_follows_its_status(scraper):
+    store = PageStore(scraper.games_fld, 'gzip')
+    assert scraper._game_page_ttl(store, MATCH_URL, match_page(600001, 1, 2)) == float(config.final_match_ttl)
+    assert scraper._game_page_ttl(store, MATCH_URL, match_page(600001, 1, 2, finished=False)) == float(config.live_match_ttl)
+
+
+def test_commentary_page_ttl_follows_its_match_page(scraper):
+    store = PageStore(scraper.games_fld, 'gzip')
+    commentary = commentary_page(600001)
+    # Nothing known about the game yet
+    assert scraper._game_page_ttl(store, COMMENTARY_URL, commentary) == float(config.live_match_ttl)
+    store.write('match_600001', match_page(600001, 1, 2, finished=False))
+    assert scraper._game_page_ttl(store, COMMENTARY_URL, commentary) == float(config.live_match_ttl)
+    store.write('match_600001', match_page(600001, 1, 2))
+    assert scraper._game_page_ttl(store, COMMENTARY_URL, commentary) == float(config.final_match_ttl)
@@ -0,0 +1,53 @@
+import pytest
+
+import code.FootballScraper as scraper
+from benchmarks.pageGenerator import match_page
+
+
+def _parse_with_soup(monkeypatch, match_file):
+    monkeypatch.setattr(scraper, 'HTML_PARSER', 'html.parser')
+    return scraper.parse_match_file(match_file)
+
+
+@pytest.mark.skipif(scraper.HTML_PARSER != 'lxml', reason='lxml is not installed')
+def test_tree_and_soup_paths_give_the_same_records(monkeypatch, match_files):
+    tree_results = [scraper.parse_match_file(f) for f in match_files]
+    soup_results = [_parse_with_soup(monkeypatch, f) for f in match_files]
+    assert tree_results == soup_results
+
+
+def test_finished_match_records(match_files):
+    result = scraper.parse_match_file(match_files[0])
+    match = result['match']
+    assert match['id'] == 'M600001'
+    assert match['status'] == 'FT'
+    assert match['venue'] == 'Stadium 1'
+    assert (match['home_side_id'], match['away_side_id']) == ('T1', 'T2')
+    assert [team['side'] for team in result['team_stats']] == ['home', 'away']
+    assert set(result['team_details']) == {'T1', 'T2'}
+
+    players = result['player_stats']
+    assert len(players) == 36
+    starters = [player for player in players if player['team_id'] == 'T1' and not player['is_sub']]
+    subs = [player for player in players if player['team_id'] == 'T1' and player['is_sub']]
+    assert len(starters) == 11 and len(subs) == 7
+    assert subs[0]['player_no'] == '12'
+    assert subs[0]['subbed_for'] == starters[-1]['id'].replace('P', 'Player ')
+    assert all(isinstance(value, (str, bool)) for player in players for value in player.values())
+
+
+def test_unplayed_match_has_no_stats(match_files):
+    result = scraper.parse_match_file(match_files[3])
+    assert result['match']['status'] == '19:45'
+    assert 'home_score' not in result['match']
+    assert result['team_stats'] == [{}, {}]
+    assert result['player_stats'] == []
+
+
+@pytest.mark.skipif(scraper.HTML_PARSER != 'lxml', reason='lxml is not installed')
+def test_unexpected_layout_falls_back_to_soup(tmp_path):
+    # A page without the competitors block the XPaths expect still fails the same way through the soup path
+    path = tmp_path / 'match_600004.html'
+    path.write_text(match_page(600004, 7, 8).replace('class="competitors"', 'class="teams"'), encoding='utf-8')
+    with pytest.raises(AttributeError):
+        scraper.parse_match_file(str(path))
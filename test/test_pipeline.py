@@ -0,0 +1,41 @@
+import pytest
+
+from code.pipeline import Checkpoint, run
+
+URL = 'https://www.espn.co.uk/football/fixtures/_/date/20220806/league/eng.2'
+
+
+def test_fixture_dates_are_recorded_once(tmp_path):
+    checkpoint = Checkpoint(f'{tmp_path}/pipeline_checkpoint.json')
+    checkpoint.fixture_page(URL, '20220806', 'downloaded')
+    # A retry pass reports the pages fetched on the first pass as fresh
+    checkpoint.fixture_page(URL, '20220806', 'fresh')
+    assert checkpoint.state['completed_dates'] == ['20220806']
+    assert checkpoint.state['last_completed_date'] == '20220806'
+
+
+def test_failed_pages_are_queued_until_fetched(tmp_path):
+    checkpoint = Checkpoint(f'{tmp_path}/pipeline_checkpoint.json')
+    checkpoint.page(URL, 'fixture_20220806', 'failed')
+    checkpoint.page(URL, 'fixture_20220806', 'failed')
+    assert checkpoint.retry_queue == [URL]
+    assert checkpoint.state['failed'][URL]['attempts'] == 2
+    checkpoint.page(URL, 'fixture_20220806', 'downloaded')
+    assert checkpoint.retry_queue == [] and checkpoint.state['failed'] == {}
+    assert checkpoint.completed_pages == {'fixture_20220806'}
+
+
+def test_resumed_checkpoint_keeps_its_state(tmp_path):
+    path = f'{tmp_path}/pipeline_checkpoint.json'
+    checkpoint = Checkpoint(path)
+    checkpoint.page(URL, 'fixture_20220806', 'downloaded')
+    checkpoint.complete('links')
+    resumed = Checkpoint(path)
+    assert resumed.resumed and resumed.is_done('links')
+    assert resumed.completed_pages == {'fixture_20220806'}
+
+
+def test_pages_stage_without_match_links_fails_early(scraper, tmp_path):
+    checkpoint = Checkpoint(f'{tmp_path}/pipeline_checkpoint.json')
+    with pytest.raises(FileNotFoundError, match='match_links.csv'):
+        run(scraper, checkpoint, stages=['pages'])
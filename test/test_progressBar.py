@@ -0,0 +1,33 @@
+import io, json
+
+from code.progressBar import Progress
+
+
+def test_updates_are_throttled_to_the_interval():
+    stream = io.StringIO()
+    with Progress(1000, 'parse', mode='json', json_interval=60, stream=stream) as progress:
+        for _ in range(1000):
+            progress.update()
+    lines = stream.getvalue().splitlines()
+    # Only the final report, the loop is far shorter than the interval
+    assert len(lines) == 1
+    report = json.loads(lines[0])
+    assert (report['task'], report['done'], report['total'], report['percent']) == ('parse', 1000, 1000, 100.0)
+
+
+def test_bar_reports_rate_and_completion():
+    stream = io.StringIO()
+    progress = Progress(10, 'fetch', mode='bar', interval=0, stream=stream)
+    progress.update(5)
+    assert 'ETA' in stream.getvalue() and '5/10' in stream.getvalue()
+    progress.update(5)
+    progress.close()
+    assert 'Job Complete' in stream.getvalue()
+    assert progress.summary().startswith('fetch Job Complete 10/10')
+
+
+def test_off_writes_nothing():
+    stream = io.StringIO()
+    with Progress(3, mode='off', stream=stream) as progress:
+        progress.update(3)
+    assert stream.getvalue() == ''
@@ -0,0 +1,102 @@
+import os, time
+from concurrent.futures import Future
+
+import code.shards as shards
+from code.FootballScraper import config
+from code.pipeline import Checkpoint
+
+
+class InlineExecutor():
+    """Runs submitted calls straight away in this process."""
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+def test_parse_seasons():
+    assert shards.parse_seasons('2013-2015') == [2013, 2014, 2015]
+    assert shards.parse_seasons('2020, 2022') == [2020, 2022]
+
+
+def test_rate_limit_is_split_between_shard_processes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(shards, 'ProcessPoolExecutor', InlineExecutor)
+    monkeypatch.setattr(shards, 'run_shard', lambda league, season, **options: calls.append(options) or 'done')
+    monkeypatch.setattr(config, 'requests_per_second', '4')
+
+    shards.run_shards([('eng.1', 2021), ('eng.1', 2022), ('eng.2', 2022)], processes=2)
+    assert [options['requests_per_second'] for options in calls] == [2.0, 2.0, 2.0]
+
+    calls.clear()
+    shards.run_shards([('eng.1', 2022)], processes=4)
+    assert calls[0]['requests_per_second'] == 4.0
+
+
+def test_shard_lock_is_exclusive(tmp_path):
+    first, second = shards.ShardLock(f'{tmp_path}/shard.lock'), shards.ShardLock(f'{tmp_path}/shard.lock')
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def _age(path, seconds):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+
+def test_stale_lock_is_broken(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'shard_lock_timeout', '60')
+    dead, lock = shards.ShardLock(f'{tmp_path}/shard.lock'), shards.ShardLock(f'{tmp_path}/shard.lock')
+    assert dead.acquire()
+    _age(dead.path, 120)
+    assert lock.acquire()
+    assert os.listdir(tmp_path) == ['shard.lock']
+    lock.release()
+
+
+def test_refreshed_lock_is_not_broken(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'shard_lock_timeout', '60')
+    holder, other = shards.ShardLock(f'{tmp_path}/shard.lock'), shards.ShardLock(f'{tmp_path}/shard.lock')
+    assert holder.acquire()
+    _age(holder.path, 120)
+    holder.refresh()
+    assert not other.acquire()
+    holder.release()
+
+
+def test_lock_refreshed_while_being_broken_is_put_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'shard_lock_timeout', '60')
+    holder, other = shards.ShardLock(f'{tmp_path}/shard.lock'), shards.ShardLock(f'{tmp_path}/shard.lock')
+    assert holder.acquire()
+    _age(holder.path, 120)
+    rename = os.rename
+    def refresh_then_rename(src, dst):
+        holder.refresh()
+        rename(src, dst)
+    monkeypatch.setattr(os, 'rename', refresh_then_rename)
+    assert not other.acquire()
+    assert os.listdir(tmp_path) == ['shard.lock']
+    holder.release()
+
+
+def test_checkpoint_saves_refresh_the_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'shard_lock_timeout', '60')
+    lock = shards.ShardLock(f'{tmp_path}/shard.lock')
+    assert lock.acquire()
+    _age(lock.path, 120)
+    checkpoint = Checkpoint(f'{tmp_path}/pipeline_checkpoint.json', heartbeat=lock.refresh)
+    checkpoint.save(force=True)
+    assert time.time() - os.path.getmtime(lock.path) < 60
+    lock.release()
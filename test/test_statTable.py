@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from code.statTable import StatTable
+
+
+@pytest.mark.parametrize('name', ['player_stats', 'team_stats'])
+def test_ndjson_records_round_trip(parsed, name):
+    records = list(parsed.iter_records(name))
+    table = parsed.load_dataset(name)
+    assert isinstance(table, StatTable)
+    assert len(table) == len(records)
+    assert list(table) == records
+    # Parsed in this session, the table holds the same records
+    assert list(getattr(parsed, name)) == records
+
+
+def test_unplayed_match_team_rows_stay_empty(parsed):
+    table = parsed.load_dataset('team_stats')
+    # Two team_stats rows per match, in the order the matches were parsed
+    unplayed = [i for i, match in enumerate(parsed.matches) if match['status'] != 'FT'][0]
+    assert table[2 * unplayed:2 * unplayed + 2] == [{}, {}]
+    df = table.to_pandas()
+    assert df.iloc[2 * unplayed:2 * unplayed + 2].isna().all().all()
+
+
+def test_rows_keep_their_keys_and_types():
+    records = [{'id': 'P1', 'match_id': 'M1', 'is_sub': False, 'played': True, 'player_no': '9', 'totalGoals': '2'},
+               {'id': 'P2', 'match_id': 'M1', 'is_sub': True, 'played': True, 'subbed_for': 'Player 1', 'subbed_time': "60'",
+                'player_no': '12', 'totalGoals': '0'}]
+    table = StatTable.from_records('player_stats', records)
+    assert list(table) == records
+    assert 'subbed_for' not in table[0]
+    assert table[-1] == records[1]
+    assert table[0:1] == records[:1]
+    with pytest.raises(IndexError):
+        table[2]
+
+
+def test_possession_comes_back_as_written():
+    records = [{'id': 'T1', 'side': 'home', 'possession': '33.3', 'shots_on_target': 4},
+               {'id': 'T2', 'side': 'away', 'possession': '66.7', 'shots_on_target': 2},
+               {'id': 'T3', 'side': 'home', 'possession': '50', 'shots_on_target': 0}]
+    table = StatTable.from_records('team_stats', records)
+    assert list(table) == records
+    assert table.kinds['possession'] == 'float' and table.kinds['shots_on_target'] == 'int'
+    assert table.to_pandas()['possession'].tolist() == [33.3, 66.7, 50.0]
+
+
+def test_columns_that_cannot_stay_typed_become_codes():
+    records = [{'id': 'P1', 'totalGoals': '1', 'player_no': '7', 'rating': '7'},
+               {'id': 'P2', 'totalGoals': 'n/a', 'player_no': 8, 'rating': None},
+               {'id': 'P3', 'totalGoals': '007', 'player_no': '9', 'rating': '6'}]
+    table = StatTable.from_records('player_stats', records)
+    assert list(table) == records
+    assert table.kinds['totalGoals'] == 'code'
+    assert table.kinds['player_no'] == 'code'
+    assert table.kinds['rating'] == 'code'
+    df = table.to_pandas()
+    assert df['rating'].isna().tolist() == [False, True, False]
+    assert df['totalGoals'].tolist() == ['1', 'n/a', '007']
+
+
+def test_new_stat_columns_are_filled_for_earlier_rows():
+    table = StatTable.from_records('player_stats', [{'id': 'P1'}, {'id': 'P2', 'saves': '3'}])
+    assert list(table) == [{'id': 'P1'}, {'id': 'P2', 'saves': '3'}]
+    assert table.to_pandas()['saves'].tolist() == [pd.NA, 3]
+
+
+def test_to_pandas_types(parsed):
+    df = parsed.player_stats.to_pandas()
+    assert len(df) == len(parsed.player_stats)
+    assert df['id'].dtype == 'category' and df['team_id'].dtype == 'category'
+    assert str(df['totalGoals'].dtype) == 'Int32' and str(df['is_sub'].dtype) == 'boolean'
+    records = pd.DataFrame(list(parsed.player_stats))
+    assert df['totalGoals'].tolist() == records['totalGoals'].astype(int).tolist()
+    assert df['id'].astype(str).tolist() == records['id'].tolist()